@@ -0,0 +1,40 @@
+"""Benchmark of the time taken by 'import gittools' in a fresh interpreter.
+
+Exits with a non-zero status if the median import time exceeds a threshold,
+so that it can be used in CI to detect regressions (e.g. gitpython imported
+again at import time).
+
+Usage: python benchmarks/bench_import.py [threshold in ms] [repeats]
+"""
+
+import subprocess
+import statistics
+import sys
+
+
+CODE = ('import time; t0 = time.perf_counter(); import gittools; '
+        'print(time.perf_counter() - t0)')
+
+
+def import_time():
+    """Time (s) of 'import gittools' in a new python process."""
+    out = subprocess.run([sys.executable, '-c', CODE], check=True,
+                         stdout=subprocess.PIPE)
+    return float(out.stdout)
+
+
+def main(threshold=50, repeats=10):
+
+    times = [import_time() for _ in range(repeats)]
+    median = statistics.median(times) * 1000
+
+    print(f'import gittools: median {median:.1f} ms, '
+          f'min {min(times) * 1000:.1f} ms ({repeats} runs)')
+
+    if median > threshold:
+        print(f'FAILED: above threshold of {threshold} ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,71 @@
+"""Benchmark of serializers of save_metadata() (throughput and output size).
+
+Serializes realistic metadata (acquisition parameters, calibration arrays,
+paths, dates, and code version of all imported packages) with each
+available serializer, for whole files (mode='write') and records of an
+append-only log (mode='append'). NumPy arrays are used if NumPy is
+installed, python lists otherwise.
+
+Usage: python benchmarks/bench_serializers.py [number of records]
+"""
+
+from pathlib import Path
+import datetime
+import random
+import sys
+import time
+
+import gittools
+from gittools import writers
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def make_info(npoints=2000):
+    """Metadata of a typical acquisition."""
+    rng = random.Random(0)
+    info = {f'param {i}': rng.random() for i in range(50)}
+    info.update({'sample': 'water-glycerol 60%',
+                 'T (°C)': 21.3,
+                 'folder': Path('data') / '2024-05-01' / 'run 12',
+                 'start': datetime.datetime(2024, 5, 1, 12, 30),
+                 'exposure times (ms)': [1, 2, 5, 10, 20]})
+    calibration = [rng.random() for _ in range(npoints)]
+    info['calibration'] = calibration if np is None else np.array(calibration)
+    return info
+
+
+def bench(serializer, data, mode, n):
+    """Records per second and size (bytes) of one record."""
+    dumps = serializer.dumps if mode == 'write' else serializer.dumps_record
+    size = len(dumps(data))
+    t0 = time.perf_counter()
+    for _ in range(n):
+        dumps(data)
+    dt = time.perf_counter() - t0
+    return n / dt, size
+
+
+def main(n=200):
+
+    data = {**make_info(), 'code version': gittools.environment_status()}
+
+    for name in writers.SERIALIZERS:
+
+        try:
+            serializer = writers.get_serializer(name)
+        except ImportError as error:
+            print(f'{name:13} not available ({error})')
+            continue
+
+        for mode in 'write', 'append':
+            rate, size = bench(serializer, data, mode, n)
+            print(f'{name:13} {mode:7} {rate:8.0f} records/s, '
+                  f'{size / 1000:7.1f} kB/record')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
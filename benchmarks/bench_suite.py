@@ -0,0 +1,260 @@
+"""Benchmark suite of gittools functions on synthetic repositories.
+
+Local repositories are generated (offline, with git fast-import) for each
+combination of parameters:
+- files: number of files in the working tree
+- depth: directory depth of files
+- commits: length of history
+- tags: number of tags (half lightweight, half annotated), on last commits
+- refs: 'loose' or 'packed' refs
+- dirty: fraction of files modified in the working tree
+
+For each repository, the latency (median of repeats) and number of
+subprocesses (e.g. git calls) per call are measured for current_commit_hash
+(with and without checks), path_status, repo_tags, module_status and
+save_metadata, cold (all gittools caches cleared before each call) and warm
+(caches filled by a previous call).
+
+Results are printed as a table, and can be written as JSON (--output) for
+regression tracking, together with information on the environment.
+
+Usage examples:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --files 100 10000 --refs loose packed
+    python benchmarks/bench_suite.py --output results.json
+"""
+
+from pathlib import Path
+from types import ModuleType
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import gittools
+
+
+ENV = {**os.environ,
+       'GIT_AUTHOR_NAME': 'bench', 'GIT_AUTHOR_EMAIL': 'bench@example.com',
+       'GIT_COMMITTER_NAME': 'bench', 'GIT_COMMITTER_EMAIL': 'bench@example.com',
+       'GIT_CONFIG_NOSYSTEM': '1'}
+
+DEFAULTS = {'files': [1000],
+            'depth': [3],
+            'commits': [100],
+            'tags': [10],
+            'refs': ['loose', 'packed'],
+            'dirty': [0, 0.01]}
+
+
+# ========================== Synthetic repositories ==========================
+
+
+def file_names(nfiles, depth):
+    """Relative paths (posix str) of nfiles files in folders of given depth."""
+    names = []
+    for i in range(nfiles):
+        folders = [f'd{(i // 10 ** (level + 1)) % 10}' for level in range(depth)]
+        names.append('/'.join(folders + [f'file{i}.txt']))
+    return names
+
+
+def make_repo(folder, files, depth, commits, tags, refs, dirty):
+    """Create repository in folder, see module docstring for parameters.
+
+    Returns list of file names in the repo.
+    """
+    subprocess.run(['git', 'init', '-q', str(folder)], check=True, env=ENV)
+
+    names = file_names(files, depth)
+    stamp = 'bench <bench@example.com> 1600000000 +0000'
+    stream = []
+
+    def data(content):
+        content = content.encode()
+        return f'data {len(content)}\n'.encode() + content + b'\n'
+
+    for i in range(commits):
+        stream.append(f'commit refs/heads/master\nmark :{i + 1}\n'.encode())
+        stream.append(f'committer {stamp}\n'.encode() + data(f'commit {i}'))
+        if i == 0:  # all files in first commit, then one file per commit
+            for name in names:
+                stream.append(f'M 644 inline {name}\n'.encode()
+                              + data(f'{name}\n'))
+        else:
+            name = names[i % len(names)]
+            stream.append(f'M 644 inline {name}\n'.encode()
+                          + data(f'{name} {i}\n'))
+
+    for i in range(min(tags, commits)):
+        mark = commits - i
+        if i % 2:
+            stream.append(f'tag v{i}\nfrom :{mark}\n'.encode())
+            stream.append(f'tagger {stamp}\n'.encode() + data(f'v{i}'))
+        else:
+            stream.append(f'reset refs/tags/v{i}\nfrom :{mark}\n\n'.encode())
+
+    subprocess.run(['git', 'fast-import', '--quiet'], input=b''.join(stream),
+                   cwd=folder, check=True, env=ENV)
+    subprocess.run(['git', 'checkout', '-q', 'master'], cwd=folder,
+                   check=True, env=ENV)
+
+    if refs == 'packed':
+        subprocess.run(['git', 'pack-refs', '--all'], cwd=folder, check=True,
+                       env=ENV)
+
+    for name in names[:round(dirty * len(names))]:
+        with open(Path(folder) / name, 'a') as f:
+            f.write('modified\n')
+
+    return names
+
+
+# ============================== Measurements ================================
+
+
+class SubprocessCounter:
+    """Count subprocesses started (gitpython, git calls) while active."""
+
+    def __init__(self):
+        self.count = 0
+        self._original = subprocess.Popen._execute_child
+
+    def __enter__(self):
+        counter = self
+        original = self._original
+
+        def _execute_child(self, *args, **kwargs):
+            counter.count += 1
+            return original(self, *args, **kwargs)
+
+        subprocess.Popen._execute_child = _execute_child
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen._execute_child = self._original
+
+
+def measure(function, repeats, cold):
+    """Median latency (s) and subprocesses per call of function()."""
+    if not cold:
+        function()  # fill caches
+
+    times = []
+    with SubprocessCounter() as counter:
+        for _ in range(repeats):
+            if cold:
+                gittools.clear_cache()
+            t0 = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - t0)
+
+    return statistics.median(times), counter.count / repeats
+
+
+def functions(folder, names, output):
+    """{name: function without arguments} of functions to benchmark."""
+    path = Path(folder) / names[-1]
+    module = ModuleType('benchmodule')
+    module.__file__ = str(path)
+
+    return {
+        'current_commit_hash (no checks)':
+            lambda: gittools.current_commit_hash(path, checkdirty=False,
+                                                 checktree=False),
+        'current_commit_hash':
+            lambda: gittools.current_commit_hash(path, checkdirty=False),
+        'path_status': lambda: gittools.path_status(path),
+        'repo_tags': lambda: gittools.repo_tags(folder),
+        'module_status': lambda: gittools.module_status(module),
+        'save_metadata': lambda: gittools.save_metadata(output, module=module),
+        'save_metadata (memoized)':
+            lambda: gittools.save_metadata(output, module=module,
+                                           status_ttl=10),
+    }
+
+
+def run_scenario(params, repeats):
+    """List of result dicts for one repository configuration."""
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        folder = Path(tmpdir) / 'repo'
+        t0 = time.perf_counter()
+        names = make_repo(folder, **params)
+        setup = time.perf_counter() - t0
+
+        output = Path(tmpdir) / 'metadata.json'
+
+        for name, function in functions(folder, names, output).items():
+            for cold in True, False:
+                latency, nproc = measure(function, repeats, cold)
+                results.append({**params,
+                                'function': name,
+                                'cache': 'cold' if cold else 'warm',
+                                'latency (s)': latency,
+                                'subprocesses': nproc,
+                                'setup (s)': setup})
+
+    return results
+
+
+# ================================== Main ====================================
+
+
+def environment():
+    git = subprocess.run(['git', '--version'], stdout=subprocess.PIPE,
+                         check=True).stdout.decode().strip()
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'git': git,
+            'gittools': gittools.__version__,
+            'time (utc)': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())}
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, nargs='+')
+    parser.add_argument('--depth', type=int, nargs='+')
+    parser.add_argument('--commits', type=int, nargs='+')
+    parser.add_argument('--tags', type=int, nargs='+')
+    parser.add_argument('--refs', nargs='+', choices=('loose', 'packed'))
+    parser.add_argument('--dirty', type=float, nargs='+')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help='JSON file to write results into')
+    args = parser.parse_args(args)
+
+    grid = {key: getattr(args, key) or values
+            for key, values in DEFAULTS.items()}
+
+    results = []
+
+    for values in itertools.product(*grid.values()):
+
+        params = dict(zip(grid, values))
+        print(', '.join(f'{key}={value}' for key, value in params.items()))
+
+        for result in run_scenario(params, args.repeats):
+            results.append(result)
+            print(f"    {result['function']:32} {result['cache']:5} "
+                  f"{result['latency (s)'] * 1000:9.2f} ms "
+                  f"{result['subprocesses']:5.1f} subprocesses")
+
+    if args.output:
+        data = {'environment': environment(), 'results': results}
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(data, f, indent=4)
+        print(f'Results written to {args.output}')
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark of repo_tags() (tags per second) on a repo with many tags.
+
+Compares gittools.repo_tags() (packed-refs and loose refs read directly)
+with the previous implementation based on gitpython (repo.tags), for loose
+and packed refs.
+
+Usage: python benchmarks/bench_tags.py [number of tags]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from git import Repo
+
+import gittools
+
+
+ENV = {**os.environ,
+       'GIT_AUTHOR_NAME': 'bench', 'GIT_AUTHOR_EMAIL': 'bench@example.com',
+       'GIT_COMMITTER_NAME': 'bench', 'GIT_COMMITTER_EMAIL': 'bench@example.com'}
+
+
+def make_repo(folder, ntags):
+    """Repo with ntags commits, each with a tag (half of them annotated)."""
+    subprocess.run(['git', 'init', '-q', str(folder)], check=True, env=ENV)
+
+    stream = []
+    for i in range(ntags):
+        message = f'commit {i}'.encode()
+        stream.append(b'commit refs/heads/master\n')
+        stream.append(f'mark :{i + 1}\n'.encode())
+        stream.append(b'committer bench <bench@example.com> 1600000000 +0000\n')
+        stream.append(f'data {len(message)}\n'.encode() + message + b'\n')
+        stream.append(f'M 644 inline file.txt\ndata {len(message)}\n'.encode()
+                      + message + b'\n')
+        if i % 2:
+            stream.append(f'tag v{i}\nfrom :{i + 1}\n'.encode())
+            stream.append(b'tagger bench <bench@example.com> 1600000000 +0000\n')
+            stream.append(f'data {len(message)}\n'.encode() + message + b'\n')
+        else:
+            stream.append(f'reset refs/tags/v{i}\nfrom :{i + 1}\n\n'.encode())
+
+    subprocess.run(['git', 'fast-import', '--quiet'], input=b''.join(stream),
+                   cwd=folder, check=True, env=ENV)
+    subprocess.run(['git', 'checkout', '-q', 'master'], cwd=folder, check=True)
+
+
+def gitpython_tags(folder):
+    """Previous implementation of repo_tags()."""
+    repo = Repo(folder)
+    return {str(tag.commit): str(tag) for tag in repo.tags}
+
+
+def timeit(function, folder, ntags):
+    t0 = time.perf_counter()
+    tags = function(folder)
+    dt = time.perf_counter() - t0
+    assert len(tags) == ntags
+    return dt
+
+
+def main(ntags=5000):
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        make_repo(tmpdir, ntags)
+
+        for refs in 'loose', 'packed':
+
+            if refs == 'packed':
+                subprocess.run(['git', 'pack-refs', '--all'], cwd=tmpdir,
+                               check=True)
+
+            for name, function in (('gittools', gittools.repo_tags),
+                                   ('gitpython', gitpython_tags)):
+                gittools.clear_cache()
+                dt = timeit(function, tmpdir, ntags)
+                print(f'{refs} refs, {name:10} {ntags} tags in {dt:.3f} s '
+                      f'({ntags / dt:.0f} tags/s)')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
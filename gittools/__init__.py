@@ -1,13 +1,58 @@
-"""Tools for using GIT in python, based on gitpython."""
-
-from .gittools import DirtyRepo, NotInTree
-from .gittools import current_commit_hash, path_status, module_status
-from .gittools import repo_tags, path_in_tree
-from .gittools import save_metadata
-
-# from importlib.metadata import version
-from importlib_metadata import version
-
-__author__ = 'Olivier Vincent'
-__version__ = version('gittools')
-__license__ = '3-Caluse BSD'
+"""Tools for using GIT in python, based on gitpython.
+
+Public names are imported lazily (PEP 562 module __getattr__), so that
+'import gittools' does not import gitpython or importlib_metadata; these are
+only imported by the functions that need them.
+"""
+
+import importlib
+
+__author__ = 'Olivier Vincent'
+__license__ = '3-Caluse BSD'
+
+# {public name: submodule where it is defined}
+_lazy = {'DirtyRepo': 'gittools',
+         'NotInTree': 'gittools',
+         'current_commit_hash': 'gittools',
+         'path_status': 'gittools',
+         'module_status': 'gittools',
+         'paths_status': 'gittools',
+         'repo_tags': 'gittools',
+         'commit_tags': 'gittools',
+         'describe': 'gittools',
+         'path_in_tree': 'gittools',
+         'RepoStatus': 'gittools',
+         'save_metadata': 'gittools',
+         'export_status': 'gittools',
+         'environment_status': 'gittools',
+         'MetadataWriter': 'background',
+         'ProvenanceStore': 'store',
+         'clear_cache': 'cache',
+         'enable_disk_cache': 'diskcache',
+         'disable_disk_cache': 'diskcache'}
+
+__all__ = list(_lazy)
+
+
+def __getattr__(name):
+    if name == '__version__':
+        # from importlib.metadata import version
+        from importlib_metadata import version
+        value = version('gittools')
+    elif name in _lazy:
+        module = importlib.import_module(f'.{_lazy[name]}', __name__)
+        value = getattr(module, name)
+    else:  # submodule, e.g. gittools.gittools
+        try:
+            value = importlib.import_module(f'.{name}', __name__)
+        except ModuleNotFoundError as error:
+            if error.name != f'{__name__}.{name}':
+                raise
+            raise AttributeError(f'module {__name__!r} '
+                                 f'has no attribute {name!r}') from None
+    globals()[name] = value  # next accesses do not go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_lazy, '__version__'})
@@ -0,0 +1,391 @@
+"""Nearest tag of a commit (similar to git describe --tags), without git."""
+
+from pathlib import Path
+from collections import OrderedDict
+import heapq
+import struct
+import threading
+
+from .objects import read_loose_object
+
+
+MAX_COMMITS = 10000   # maximum number of commits walked to find a tag
+MAX_CANDIDATES = 10   # number of tags considered, as in git describe
+MAX_MEMO_COMMITS = 200000  # maximum number of commits with memoized parents
+ABBREV = 7            # number of characters of abbreviated hashes
+
+NO_GENERATION = 2 ** 31  # commits not in commit-graph (i.e. most recent)
+
+
+# =============================== Commit graph ===============================
+
+
+class CommitGraph:
+    """Reader of the commit-graph file (.git/objects/info/commit-graph).
+
+    Gives parents, generation number and commit time of commits without
+    reading commit objects. Only single-file commit graphs (no chains) with
+    sha1 hashes are supported; CommitGraph.load() returns None otherwise.
+    """
+
+    PARENT_NONE = 0x70000000
+    EXTRA_EDGES = 0x80000000
+
+    _CDAT = struct.Struct('>20sIIII')
+
+    def __init__(self, data):
+        self.data = data
+        signature, version, hash_version, nchunks, nbase = \
+            struct.unpack_from('>4sBBBB', data, 0)
+
+        if signature != b'CGPH' or version != 1 or hash_version != 1:
+            raise ValueError('Unsupported commit-graph')
+        if nbase:
+            raise ValueError('Commit-graph chains not supported')
+
+        self.chunks = {}
+        for i in range(nchunks):
+            chunk_id, offset = struct.unpack_from('>4sQ', data, 8 + 12 * i)
+            self.chunks[chunk_id] = offset
+
+        self.fanout = struct.unpack_from('>256I', data, self.chunks[b'OIDF'])
+        self.n = self.fanout[-1]
+
+    @classmethod
+    def load(cls, commondir):
+        """CommitGraph of repo, or None if no (supported) commit-graph."""
+        file = Path(commondir) / 'objects' / 'info' / 'commit-graph'
+        try:
+            return cls(file.read_bytes())
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+    def _oid(self, pos):
+        start = self.chunks[b'OIDL'] + 20 * pos
+        return self.data[start:start + 20]
+
+    def position(self, sha):
+        """Position of commit (hex str) in graph, or None if not in graph."""
+        binsha = bytes.fromhex(sha)
+        first = binsha[0]
+        lo = self.fanout[first - 1] if first else 0
+        hi = self.fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            oid = self._oid(mid)
+            if oid < binsha:
+                lo = mid + 1
+            elif oid > binsha:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def sha(self, pos):
+        """Commit hash (hex str) at position pos."""
+        return self._oid(pos).hex()
+
+    def tree(self, pos):
+        """Hash (hex str) of root tree of commit at position pos."""
+        start = self.chunks[b'CDAT'] + 36 * pos
+        return self.data[start:start + 20].hex()
+
+    def commit(self, pos):
+        """Return (parent positions, generation, commit time) of commit."""
+        _, parent1, parent2, gen_time, time_low = \
+            self._CDAT.unpack_from(self.data, self.chunks[b'CDAT'] + 36 * pos)
+
+        parents = []
+        if parent1 != self.PARENT_NONE:
+            parents.append(parent1)
+        if parent2 & self.EXTRA_EDGES:
+            offset = self.chunks[b'EDGE'] + 4 * (parent2 & ~self.EXTRA_EDGES)
+            while True:
+                edge, = struct.unpack_from('>I', self.data, offset)
+                parents.append(edge & ~self.EXTRA_EDGES)
+                if edge & self.EXTRA_EDGES:
+                    break
+                offset += 4
+        elif parent2 != self.PARENT_NONE:
+            parents.append(parent2)
+
+        generation = gen_time >> 2
+        commit_time = ((gen_time & 0b11) << 32) + time_low
+        return parents, generation, commit_time
+
+
+# ============================= Ancestry walk ================================
+
+
+def _parse_commit(data):
+    """Return (parent hashes, committer time) from commit object data."""
+    parents = []
+    commit_time = 0
+    for line in data.split(b'\n'):
+        if not line:  # end of headers, start of message
+            break
+        if line.startswith(b'parent '):
+            parents.append(line[7:].decode())
+        elif line.startswith(b'committer '):
+            commit_time = int(line.rsplit(b' ', 2)[1])
+    return parents, commit_time
+
+
+class Describer:
+    """Nearest-tag computation for a repository, with memoization.
+
+    Parents of commits are obtained from the commit-graph file when present
+    and otherwise by reading commit objects. The walk follows the algorithm
+    of git describe (commits in order of decreasing commit time, several
+    candidate tags with their depth), so that results are the same. With a
+    commit-graph, generation numbers allow to stop the walk as soon as no
+    remaining commit can have a tagged ancestor. Results are memoized per
+    commit, tags fingerprint (see refs.TagIndex) and max number of commits.
+
+    Parameters
+    ----------
+    - commondir: common git directory of repository
+    - read_object: function hash -> (type, data) for objects not stored as
+      loose objects (e.g. using the gitpython object database); can also be
+      given at each nearest_tag() / describe() call, e.g. when the describer
+      is shared by threads that each have their own object database handle
+    - maxsize: max number of memoized results
+    """
+
+    def __init__(self, commondir, read_object=None, maxsize=256):
+        self.commondir = Path(commondir)
+        self.read_object = read_object
+        self.graph = CommitGraph.load(commondir)
+        self.graph_fingerprint = self._graph_fingerprint()
+        self.maxsize = maxsize
+        self._commits = {}              # {hash: (parents, generation, time)}
+        self._results = OrderedDict()   # {(hash, tags, max): result}
+        self._min_generations = {}      # {tags fingerprint: generation}
+        self._lock = threading.Lock()
+
+    def _graph_fingerprint(self):
+        file = self.commondir / 'objects' / 'info' / 'commit-graph'
+        try:
+            st = file.stat()
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def is_valid(self):
+        """False if the commit-graph file has changed since creation."""
+        return self._graph_fingerprint() == self.graph_fingerprint
+
+    def _commit(self, sha, read_object=None):
+        """(parents, generation, commit time) of commit, memoized."""
+        try:
+            return self._commits[sha]
+        except KeyError:
+            pass
+
+        pos = None if self.graph is None else self.graph.position(sha)
+
+        if pos is not None:
+            parent_pos, generation, commit_time = self.graph.commit(pos)
+            parents = [self.graph.sha(p) for p in parent_pos]
+        else:
+            obj = read_loose_object(self.commondir, sha)
+            if obj is None and read_object is not None:
+                try:
+                    obj = read_object(sha)
+                except (ValueError, OSError):  # e.g. shallow clone
+                    obj = None
+            if obj is None:
+                parents, commit_time = [], 0
+            else:
+                parents, commit_time = _parse_commit(obj[1])
+            generation = 0 if self.graph is None else NO_GENERATION
+
+        if len(self._commits) >= MAX_MEMO_COMMITS:
+            self._commits.clear()
+        self._commits[sha] = result = parents, generation, commit_time
+        return result
+
+    def _min_generation(self, tag_index):
+        """Lowest generation number of tagged commits in the commit-graph.
+
+        Ancestors of a commit have lower generation numbers, so that commits
+        below that generation can't be or have a tagged ancestor. Tagged
+        commits that are not in the commit-graph are not considered, since
+        they can't be ancestors of commits in the graph. Returns 0 (i.e.
+        no pruning) if there is no commit-graph.
+        """
+        if self.graph is None:
+            return 0
+        key = tag_index.fingerprint
+        try:
+            return self._min_generations[key]
+        except KeyError:
+            pass
+        generation = NO_GENERATION
+        for commit in set(tag_index.tags.values()):
+            pos = self.graph.position(commit)
+            if pos is not None:
+                generation = min(generation, self.graph.commit(pos)[1])
+        self._min_generations.clear()  # only useful for latest tags
+        self._min_generations[key] = generation
+        return generation
+
+    def _priority(self, sha, counter, read_object=None):
+        """Queue item: most recent commit time first (FIFO for equal times)."""
+        _, _, commit_time = self._commit(sha, read_object)
+        return -commit_time, counter, sha
+
+    def nearest_tag(self, sha, tag_index, max_commits=MAX_COMMITS,
+                    read_object=None):
+        """Return (tag, number of commits walked) of nearest tag, or None.
+
+        INPUTS
+        ------
+        - sha: hex str of commit to describe
+        - tag_index: refs.TagIndex of the repository
+        - max_commits: stop searching after walking that many commits
+        - read_object: function hash -> (type, data), replaces the one given
+          at creation for this call
+
+        OUTPUT
+        ------
+        (tag name, distance), distance being the number of commits in the
+        history of sha that are not in the history of the tag (0 if sha is
+        tagged), as in git describe; None if the repository has no tags or
+        if no tag is found within max_commits commits. If the walk stops at
+        max_commits after finding tags, the best candidate so far is
+        returned, with a distance that can be underestimated.
+        """
+        if len(tag_index) == 0:
+            return None
+
+        if read_object is None:
+            read_object = self.read_object
+
+        key = sha, tag_index.fingerprint, max_commits
+
+        with self._lock:
+
+            try:
+                self._results.move_to_end(key)
+            except KeyError:
+                pass
+            else:
+                return self._results[key]
+
+            result = self._walk(sha, tag_index, max_commits, read_object)
+
+            self._results[key] = result
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+        return result
+
+    def _walk(self, sha, tag_index, max_commits, read_object):
+        """Ancestry walk of nearest_tag() (no memoization)."""
+        name = tag_index.describe_name(sha, read_object)
+        if name is not None:
+            return name, 0
+
+        # Same algorithm as git describe: commits are popped by commit time;
+        # each tagged commit found becomes a candidate (up to MAX_CANDIDATES)
+        # with a flag propagated to its ancestors, and the depth of a
+        # candidate is the number of popped commits not flagged with it.
+        # The candidate with lowest depth (first found on ties) wins.
+        flags = {sha: 0}  # {commit: bit mask of candidates}, for seen commits
+        counter = 0       # to pop commits of same time in FIFO order
+        queue = [self._priority(sha, counter, read_object)]
+        candidates = []   # [tag name, depth, flag]
+        walked = 0
+        gave_up_on = None
+
+        # number of queued commits that can be or have tagged ancestors
+        min_generation = self._min_generation(tag_index)
+        reachable = int(self._commit(sha, read_object)[1] >= min_generation)
+
+        def push_parents(commit):
+            nonlocal counter, reachable
+            for parent in self._commit(commit, read_object)[0]:
+                if parent not in flags:
+                    flags[parent] = 0
+                    counter += 1
+                    heapq.heappush(queue, self._priority(parent, counter,
+                                                         read_object))
+                    if self._commit(parent, read_object)[1] >= min_generation:
+                        reachable += 1
+                flags[parent] |= flags[commit]
+
+        def best():
+            return min(candidates, key=lambda candidate: candidate[1])
+
+        while queue and walked < max_commits:
+
+            # if all remaining commits descend from the best candidate,
+            # its depth can't change and later candidates can't be nearer
+            if candidates:
+                flag = best()[2]
+                if all(flags[c] & flag for *_, c in queue):
+                    break
+            elif not reachable:  # no tag can be found anymore
+                break
+
+            *_, current = heapq.heappop(queue)
+            walked += 1
+            if self._commit(current, read_object)[1] >= min_generation:
+                reachable -= 1
+
+            name = tag_index.describe_name(current, read_object)
+            if name is not None:
+                if len(candidates) == MAX_CANDIDATES:
+                    gave_up_on = current
+                    break
+                flag = 1 << len(candidates)
+                candidates.append([name, walked - 1, flag])
+                flags[current] |= flag
+
+            for candidate in candidates:
+                if not flags[current] & candidate[2]:
+                    candidate[1] += 1
+
+            push_parents(current)
+
+        if not candidates:
+            return None
+
+        tag = best()
+
+        if gave_up_on is not None:
+            counter += 1
+            heapq.heappush(queue, self._priority(gave_up_on, counter,
+                                                 read_object))
+            walked -= 1
+
+        # finish depth computation of best candidate only
+        while queue and walked < max_commits:
+            *_, current = heapq.heappop(queue)
+            walked += 1
+            if flags[current] & tag[2]:
+                if all(flags[c] & tag[2] for *_, c in queue):
+                    break
+            else:
+                tag[1] += 1
+            push_parents(current)
+
+        name, depth, _ = tag
+        return name, depth
+
+    def describe(self, sha, tag_index, max_commits=MAX_COMMITS,
+                 read_object=None):
+        """Describe commit as e.g. 'v1.4.2-17-gabc1234' (git describe --tags)
+
+        Returns the tag name only if sha is tagged, and None if no tag is
+        found within max_commits commits. See nearest_tag() for parameters.
+        """
+        result = self.nearest_tag(sha, tag_index, max_commits=max_commits,
+                                  read_object=read_object)
+        if result is None:
+            return None
+        tag, distance = result
+        if distance == 0:
+            return tag
+        return f'{tag}-{distance}-g{sha[:ABBREV]}'
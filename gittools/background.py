@@ -0,0 +1,125 @@
+"""Background writing of metadata, off the caller's (e.g. acquisition) thread.
+
+MetadataWriter.save() only records the time and a copy of the info dict,
+and puts them in a bounded queue; a background thread then computes the
+status of modules (see module_status()) and writes the files, in the order
+of submission. Exceptions raised in the background are re-raised by flush()
+and close(); pending records are written at interpreter exit.
+"""
+
+from copy import deepcopy
+from datetime import datetime
+import atexit
+import queue
+import threading
+
+from .gittools import _make_metadata, _write_metadata
+from . import writers
+
+
+_STOP = object()  # sentinel telling the background thread to exit
+
+
+class MetadataWriter:
+    """Asynchronous save_metadata(), with a background thread and a queue.
+
+    Example
+    -------
+    writer = MetadataWriter()
+    for frame in frames:
+        ...
+        writer.save('log.jsonl', info={'frame': n}, module=mymodule,
+                    mode='append')
+    writer.close()  # or writer.flush() to wait for pending writes
+
+    Can also be used as a context manager (close() called at exit).
+
+    Parameters
+    ----------
+    - maxsize: maximum number of pending records; when the queue is full,
+      save() waits for a free slot (block=True) or raises queue.Full
+      (block=False).
+    """
+
+    def __init__(self, maxsize=1000):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._errors = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run,
+                                        name='gittools-metadata-writer',
+                                        daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                file, mode, serializer, kwargs = job
+                _write_metadata(file, _make_metadata(**kwargs), mode,
+                                serializer)
+            except Exception as error:
+                self._errors.append(error)
+            finally:
+                self._queue.task_done()
+
+    def save(self, file, info=None, module=None, mode='write',
+             serializer='json', block=True, timeout=None, **options):
+        """Queue metadata to be saved in file, see save_metadata().
+
+        The time of the record is the time of the call; info is copied, so
+        that it can be modified by the caller afterwards.
+
+        Parameters
+        ----------
+        - file, info, module, mode, serializer: see save_metadata()
+        - block, timeout: behavior if the queue is full, see queue.Queue.put()
+        - options: other keyword arguments of save_metadata()
+          (dirty_warning, dirty_ok, nogit_ok, scope, etc.)
+        """
+        if mode not in writers.MODES:
+            raise ValueError(f"mode must be in {writers.MODES}, not {mode!r}")
+
+        serializer = writers.get_serializer(serializer)
+
+        kwargs = {'info': deepcopy(info),
+                  'module': module,
+                  'time': datetime.utcnow(),
+                  **options}
+
+        with self._lock:  # so that nothing is queued after close()
+            if self._closed:
+                raise RuntimeError('MetadataWriter is closed.')
+            self._queue.put((file, mode, serializer, kwargs),
+                            block=block, timeout=timeout)
+
+    def _raise_errors(self):
+        """Re-raise first exception that occurred in background (if any)."""
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise errors[0]
+
+    def flush(self):
+        """Wait until all queued records are written."""
+        self._queue.join()
+        self._raise_errors()
+
+    def close(self):
+        """Write pending records and stop the background thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise_errors()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,288 @@
+"""Process-wide caches of gitpython Repo handles, commit trees and tags."""
+
+from pathlib import Path
+from collections import OrderedDict
+from functools import lru_cache
+import threading
+
+from .refs import git_dir, head_ref, TagIndex, clear_tag_folders_cache
+from .ancestry import Describer
+from .discovery import find_dotgit, clear_discovery_cache
+from .distributions import clear_distributions_cache
+from .memo import clear_status_memo
+
+
+# ============================ Repo handle cache =============================
+
+
+def _stat_signature(path):
+    """Return (inode, mtime, size) of path, or None if it does not exist."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def repo_fingerprint(repo):
+    """Stat signature of the files that change when HEAD, index or refs change.
+
+    INPUT
+    -----
+    - repo: *gitpython* Repo object
+
+    OUTPUT
+    ------
+    tuple, which compares equal as long as HEAD, the index and refs
+    (current branch, packed-refs, refs/heads and refs/tags) are unchanged.
+    """
+    gitdir = Path(repo.git_dir)
+    commondir = Path(repo.common_dir)
+
+    try:
+        branch = head_ref(gitdir)
+    except OSError:
+        branch = None
+
+    files = [gitdir / 'HEAD', gitdir / 'index', commondir / 'packed-refs',
+             commondir / 'refs' / 'heads', commondir / 'refs' / 'tags']
+
+    if branch is not None:
+        files.append(commondir / branch)
+
+    return (branch,) + tuple(_stat_signature(f) for f in files)
+
+
+class RepoCache:
+    """Bounded, thread-safe LRU cache of Repo objects.
+
+    gitpython Repo objects (and their persistent git cat-file processes) are
+    not thread-safe, so handles are keyed by (git directory, thread id): each
+    thread gets its own Repo object for a given repository.
+
+    Entries are revalidated at each access with repo_fingerprint(): if HEAD,
+    the index or refs changed on disk, the old handle is dropped and a new one
+    is created. Handles are only closed explicitly by the thread they belong
+    to, or once that thread has exited (handles of threads that have exited
+    are reclaimed when new handles are created); handles of other running
+    threads are just dereferenced (gitpython closes them when they are
+    garbage collected), since they might still be in use.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._repos = OrderedDict()  # {(git dir, thread): (repo, fingerprint)}
+        self._lock = threading.RLock()
+
+    def get(self, path, ceiling=None):
+        """Return (possibly cached) Repo object for the repo containing path.
+
+        The returned object must only be used in the calling thread.
+        See discovery.find_dotgit() for the ceiling parameter.
+        Raises InvalidGitRepositoryError if path is not in a git repository.
+        """
+        from git import Repo  # gitpython imported only here, see __init__.py
+
+        dotgit = find_dotgit(path, ceiling=ceiling)
+        key = str(git_dir(dotgit).resolve()), threading.get_ident()
+
+        with self._lock:
+
+            try:
+                repo, fingerprint = self._repos[key]
+            except KeyError:
+                pass
+            else:
+                if repo_fingerprint(repo) == fingerprint:
+                    self._repos.move_to_end(key)
+                    return repo
+                self._discard(key)
+
+            self._reclaim()
+
+            repo = Repo(dotgit.parent)
+            self._repos[key] = repo, repo_fingerprint(repo)
+
+            while len(self._repos) > self.maxsize:
+                self._discard(next(iter(self._repos)))
+
+            return repo
+
+    def _discard(self, key, alive=None):
+        """Remove handle, closing it unless its thread is another live one"""
+        repo, _ = self._repos.pop(key)
+        _, thread = key
+        if alive is None:
+            alive = {t.ident for t in threading.enumerate()}
+        if thread == threading.get_ident() or thread not in alive:
+            repo.close()
+
+    def _reclaim(self):
+        """Close and remove handles of threads that have exited."""
+        alive = {thread.ident for thread in threading.enumerate()}
+        for key in [key for key in self._repos if key[1] not in alive]:
+            self._discard(key, alive)
+
+    def clear(self):
+        """Remove all cached Repo objects (closing those of calling thread and
+        of threads that have exited)."""
+        with self._lock:
+            alive = {thread.ident for thread in threading.enumerate()}
+            for key in list(self._repos):
+                self._discard(key, alive)
+
+    def __len__(self):
+        return len(self._repos)
+
+
+# =========================== Tracked paths cache ============================
+
+
+class TrackedPathsCache:
+    """Bounded, thread-safe LRU cache of tracked paths of commits.
+
+    For each commit (keyed by hash), stores a frozenset of all paths (files
+    and folders, unix-style, relative to repo root) of the commit's tree, so
+    that tree membership tests are set lookups.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._paths = OrderedDict()  # {commit hash: frozenset of paths}
+        self._lock = threading.Lock()
+
+    def get(self, commit):
+        """Return frozenset of paths in tree of commit (gitpython object)."""
+        key = commit.hexsha
+
+        with self._lock:
+            try:
+                self._paths.move_to_end(key)
+            except KeyError:
+                pass
+            else:
+                return self._paths[key]
+
+        # single git call listing the whole tree (-t: include folders)
+        output = commit.repo.git.ls_tree('-r', '-t', '-z', '--name-only', key)
+        paths = frozenset(output.split('\0')) - {''}
+
+        with self._lock:
+            self._paths[key] = paths
+            while len(self._paths) > self.maxsize:
+                self._paths.popitem(last=False)
+
+        return paths
+
+    def clear(self):
+        """Remove all cached trees."""
+        with self._lock:
+            self._paths.clear()
+
+    def __len__(self):
+        return len(self._paths)
+
+
+# ======================== Per-repository objects ===========================
+
+
+class RepoObjectCache:
+    """Thread-safe cache of per-repository objects keyed by common git dir.
+
+    Objects are created with factory(common dir, read_object=...) and must
+    have an is_valid() method telling if they are still up to date; they are
+    re-created when they are not. Objects are shared by all threads, so they
+    must not keep read_object (bound to the Repo of the creating thread) for
+    later use.
+    """
+
+    def __init__(self, factory, is_valid):
+        self.factory = factory
+        self.is_valid = is_valid
+        self._objects = {}  # {common dir: object}
+        self._lock = threading.Lock()
+
+    def get(self, repo):
+        """Return (possibly cached) object for repo (gitpython Repo)."""
+        key = repo.common_dir
+
+        with self._lock:
+            obj = self._objects.get(key)
+
+        if obj is not None and self.is_valid(obj, key):
+            return obj
+
+        obj = self.factory(key, read_object=object_reader(repo))
+
+        with self._lock:
+            self._objects[key] = obj
+
+        return obj
+
+    def clear(self):
+        """Remove all cached objects."""
+        with self._lock:
+            self._objects.clear()
+
+
+def object_reader(repo):
+    """Function returning (type, data) of object from its hash (gitpython)."""
+    def read_object(sha):
+        ostream = repo.odb.stream(bytes.fromhex(sha))
+        return ostream.type.decode(), ostream.read()
+    return read_object
+
+
+_repo_cache = RepoCache()
+_tracked_paths_cache = TrackedPathsCache()
+# Tag indexes rebuilt only when tags (packed-refs, loose tags) change, and
+# describers (which memoize commit ancestry) only if the commit-graph changes.
+# Describers read objects lazily, so they get read_object at each call.
+_tag_index_cache = RepoObjectCache(TagIndex, lambda obj, key: obj.is_valid(key))
+_describer_cache = RepoObjectCache(lambda key, read_object: Describer(key),
+                                   lambda obj, key: obj.is_valid())
+
+
+def get_repo(path, ceiling=None):
+    """Return cached Repo object of the git repository path belongs to."""
+    return _repo_cache.get(path, ceiling=ceiling)
+
+
+def tag_index(repo):
+    """Return (cached) TagIndex of repo (gitpython Repo object)."""
+    return _tag_index_cache.get(repo)
+
+
+def describer(repo):
+    """Return (cached) Describer of repo (gitpython Repo object)."""
+    return _describer_cache.get(repo)
+
+
+def commit_graph(repo):
+    """(cached) ancestry.CommitGraph of repo, None if no commit-graph file."""
+    return _describer_cache.get(repo).graph
+
+
+def tracked_paths(commit):
+    """Return (cached) frozenset of paths in the tree of commit."""
+    return _tracked_paths_cache.get(commit)
+
+
+@lru_cache(maxsize=64)
+def working_dir(repo_working_dir):
+    """Fully resolved path object of a repo's working dir (str), cached."""
+    return Path(repo_working_dir).resolve()
+
+
+def clear_cache():
+    """Clear all caches (Repo handles, trees, tags, discovery, installed
+    distributions, memoized module status) of gittools."""
+    _repo_cache.clear()
+    _tracked_paths_cache.clear()
+    _tag_index_cache.clear()
+    _describer_cache.clear()
+    working_dir.cache_clear()
+    clear_discovery_cache()
+    clear_tag_folders_cache()
+    clear_distributions_cache()
+    clear_status_memo()
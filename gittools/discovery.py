@@ -0,0 +1,165 @@
+"""Find the git repository a path belongs to, with memoization."""
+
+from pathlib import Path
+import os
+import site
+import sysconfig
+import threading
+
+
+MAX_MEMO_SIZE = 4096
+
+
+# ========================== Known non-repo folders ==========================
+
+
+def _non_repo_roots():
+    """Folders (site-packages, stdlib) above which no repo is searched for.
+
+    Python modules located under these folders are installed packages, so
+    there is no point in walking up to / looking for a .git folder. Note that
+    a repo located *inside* one of these folders is still found.
+    """
+    folders = set()
+
+    for name in 'stdlib', 'platstdlib', 'purelib', 'platlib':
+        try:
+            folders.add(sysconfig.get_paths()[name])
+        except KeyError:
+            pass
+
+    try:
+        folders.update(site.getsitepackages())
+    except AttributeError:  # e.g. old virtualenv versions
+        pass
+
+    try:
+        folders.add(site.getusersitepackages())
+    except AttributeError:
+        pass
+
+    return frozenset(str(Path(f).resolve()) for f in folders)
+
+
+def _env_ceilings():
+    """Ceiling directories from the GIT_CEILING_DIRECTORIES env variable."""
+    value = os.environ.get('GIT_CEILING_DIRECTORIES', '')
+    return tuple(str(Path(f).resolve()) for f in value.split(os.pathsep) if f)
+
+
+def _ceilings(ceiling):
+    """Combine ceiling argument (path or iterable of paths) with env var."""
+    if ceiling is None:
+        ceiling = ()
+    elif isinstance(ceiling, (str, os.PathLike)):
+        ceiling = ceiling,
+    own = tuple(str(Path(f).resolve()) for f in ceiling)
+    return frozenset(own + _env_ceilings())
+
+
+# =============================== Discovery ==================================
+
+
+class RepoFinder:
+    """Memoized search of .git entries from folders upwards.
+
+    Results (including negative results, i.e. folders not in a repo) are
+    stored for every folder visited during the search, so that subsequent
+    searches from the same folder or from any of its subfolders stop early.
+
+    The search does not enter ceiling directories (GIT_CEILING_DIRECTORIES
+    environment variable, or ceiling argument), as git does, and stops at
+    site-packages and stdlib folders.
+    """
+
+    def __init__(self):
+        self._memo = {}  # {(folder, ceilings): .git path or None}
+        self._lock = threading.Lock()
+        self.non_repo_roots = _non_repo_roots()
+
+    def _search(self, folder, ceilings):
+        """Return .git path (or None) and list of folders visited."""
+        visited = []
+
+        for candidate in (folder, *folder.parents):
+
+            name = str(candidate)
+
+            try:
+                dotgit = self._memo[name, ceilings]
+            except KeyError:
+                pass
+            else:
+                if dotgit is None or dotgit.exists():
+                    return dotgit, visited
+
+            dotgit = candidate / '.git'
+            if dotgit.exists():
+                return dotgit, visited
+
+            visited.append(name)
+
+            if name in self.non_repo_roots:
+                return None, visited
+
+            if str(candidate.parent) in ceilings:
+                return None, visited
+
+        return None, visited
+
+    def find(self, path, ceiling=None, missing_ok=False):
+        """Return the first .git entry (dir or file) in path or its parents.
+
+        INPUTS
+        ------
+        - path: str or path object of folder or file (fully resolved)
+        - ceiling: folder or iterable of folders the search does not enter,
+          in addition to those in GIT_CEILING_DIRECTORIES.
+        - missing_ok: if True, return None if path is not in a git repository
+          instead of raising InvalidGitRepositoryError.
+
+        OUTPUT
+        ------
+        path object of .git folder or file.
+
+        Raises InvalidGitRepositoryError if path is not in a git repository.
+        """
+        path = Path(path)
+        folder = path if path.is_dir() else path.parent
+        ceilings = _ceilings(ceiling)
+
+        dotgit, visited = self._search(folder, ceilings)
+
+        with self._lock:
+            if len(self._memo) + len(visited) > MAX_MEMO_SIZE:
+                self._memo.clear()
+            for name in visited:
+                self._memo[name, ceilings] = dotgit
+
+        if dotgit is None and not missing_ok:
+            # gitpython imported only here, see __init__.py
+            from git import InvalidGitRepositoryError
+            raise InvalidGitRepositoryError(str(path))
+
+        return dotgit
+
+    def clear(self):
+        """Forget all memoized results."""
+        with self._lock:
+            self._memo.clear()
+
+
+_repo_finder = RepoFinder()
+
+
+def find_dotgit(path, ceiling=None, missing_ok=False):
+    """Return the first .git entry (dir or file) in path or its parents.
+
+    See RepoFinder.find() for details.
+    """
+    return _repo_finder.find(path, ceiling=ceiling, missing_ok=missing_ok)
+
+
+def clear_discovery_cache():
+    """Forget all memoized folder -> repository results."""
+    _repo_finder.clear()
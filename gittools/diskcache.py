@@ -0,0 +1,153 @@
+"""Optional on-disk cache of repository status, shared between processes.
+
+The cache is disabled by default. It is enabled with enable_disk_cache(), or
+by setting the GITTOOLS_DISK_CACHE environment variable to 1 (default cache
+folder) or to a folder path. The default folder is $XDG_CACHE_HOME/gittools
+(~/.cache/gittools if XDG_CACHE_HOME is not set).
+
+There is one JSON file per repository, containing the HEAD commit hash,
+tags, describe string and tree membership of paths, and a fingerprint of
+HEAD, refs, packed-refs and index (inode, mtime, size): the cached data is
+only used if the fingerprint still matches. Reads do not use any lock, and
+writes are atomic (temporary file + rename), so that many concurrent
+processes can share the cache safely.
+
+Note: the dirty/clean status is NOT cached, because changes in the working
+tree do not modify the fingerprint; it is always recomputed (see index.py).
+"""
+
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+
+from .refs import head_ref, tags_fingerprint
+
+
+_settings = {'folder': None}
+
+
+# ============================ Enable / disable ==============================
+
+
+def _default_folder():
+    xdg = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(xdg) / 'gittools'
+
+
+def enable_disk_cache(folder=None):
+    """Enable on-disk cache, in folder (default: $XDG_CACHE_HOME/gittools)."""
+    _settings['folder'] = Path(folder) if folder else _default_folder()
+
+
+def disable_disk_cache():
+    """Disable on-disk cache (files already written are kept)."""
+    _settings['folder'] = False
+
+
+def cache_folder():
+    """Folder of on-disk cache, or None if the cache is disabled."""
+    folder = _settings['folder']
+    if folder is None:  # not set explicitly, use environment variable
+        value = os.environ.get('GITTOOLS_DISK_CACHE', '')
+        if value in ('', '0'):
+            return None
+        return _default_folder() if value == '1' else Path(value)
+    return folder or None
+
+
+# =============================== Fingerprint ================================
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def fingerprint(gitdir, commondir):
+    """Hash (hex str) of stat data of HEAD, refs, packed-refs and index."""
+    gitdir = Path(gitdir)
+    commondir = Path(commondir)
+
+    try:
+        branch = head_ref(gitdir)
+    except OSError:
+        branch = None
+
+    data = [str(gitdir), branch,
+            _stat(gitdir / 'HEAD'),
+            _stat(gitdir / 'index'),
+            tags_fingerprint(commondir)]  # includes packed-refs
+
+    if branch is not None:
+        data.append(_stat(commondir / branch))
+
+    return hashlib.sha1(repr(data).encode()).hexdigest()
+
+
+# ============================== Read / write ================================
+
+
+def _cache_file(folder, gitdir):
+    name = hashlib.sha1(str(Path(gitdir).resolve()).encode()).hexdigest()
+    return Path(folder) / f'{name}.json'
+
+
+def load(gitdir, fprint):
+    """Return cached data of repo if fingerprint matches, else None.
+
+    INPUTS
+    ------
+    - gitdir: git directory of repository (or worktree)
+    - fprint: current fingerprint of repository (see fingerprint())
+
+    OUTPUT
+    ------
+    dict with keys 'hash', 'tags', 'describe', 'in_tree' ({path: bool}),
+    or None if disk cache is disabled or data is missing / out of date.
+    """
+    folder = cache_folder()
+    if folder is None:
+        return None
+
+    try:
+        with open(_cache_file(folder, gitdir), 'r', encoding='utf8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get('fingerprint') != fprint:
+        return None
+
+    return data
+
+
+def save(gitdir, fprint, data):
+    """Atomically write data of repository with its fingerprint.
+
+    Does nothing if the disk cache is disabled. Errors (e.g. read-only file
+    system) are silently ignored, since the cache is only an optimization.
+    """
+    folder = cache_folder()
+    if folder is None:
+        return
+
+    file = _cache_file(folder, gitdir)
+    data = {**data, 'fingerprint': fprint}
+
+    try:
+        folder.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf8') as f:
+                json.dump(data, f)
+            os.replace(tmp, file)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass
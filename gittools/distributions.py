@@ -0,0 +1,167 @@
+"""Version of installed packages from a one-shot index of distributions.
+
+importlib_metadata.version(name) scans all sys.path entries at every call,
+and only works if name is a distribution name, which is not always the
+import name of the package (e.g. 'yaml' from distribution 'PyYAML'). Here,
+all installed distributions are scanned once and indexed by top-level import
+name (top_level.txt or, if missing, RECORD file list, as in
+importlib_metadata.packages_distributions()) and by distribution name. The
+index is rebuilt automatically when sys.path changes.
+
+The index also contains the PEP 610 direct_url.json data of distributions,
+which records the URL (and VCS commit) a package was installed from, e.g.
+with 'pip install git+https://...' or 'pip install -e path/to/checkout'.
+"""
+
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+import json
+import re
+import sys
+import threading
+
+
+# versions: {name: version}, urls: {name: parsed direct_url.json}
+_index = {'path': None, 'versions': {}, 'urls': {}}
+_lock = threading.Lock()
+
+
+def _normalize(name):
+    """Normalized distribution name (PEP 503), e.g. 'PyYAML' -> 'pyyaml'."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _top_level_names(dist):
+    """Top-level import names provided by distribution."""
+    text = dist.read_text('top_level.txt')
+    if text:
+        return text.split()
+
+    names = []
+    for file in dist.files or ():
+        if file.suffix == '.py':
+            names.append(file.parts[0] if len(file.parts) > 1 else file.stem)
+    return names
+
+
+def _direct_url(dist):
+    """Parsed direct_url.json of distribution (None if missing / invalid)."""
+    text = dist.read_text('direct_url.json')
+    if not text:
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) and 'url' in data else None
+
+
+def _build():
+    """Dicts {import name or normalized dist name: version / direct url}.
+
+    If several distributions provide the same name, the first one on sys.path
+    wins, as for imports.
+    """
+    import importlib_metadata  # see __init__.py
+
+    versions = {}
+    urls = {}
+    seen = set()
+
+    for dist in importlib_metadata.distributions():
+
+        name = dist.metadata['Name']
+        if name is None:  # broken metadata
+            continue
+        version = dist.version
+        url = _direct_url(dist)
+
+        for key in (_normalize(name), *_top_level_names(dist)):
+            if key not in seen:
+                seen.add(key)
+                versions[key] = version
+                if url is not None:
+                    urls[key] = url
+
+    return versions, urls
+
+
+def _get_index():
+    """Index {'versions': ..., 'urls': ...}, rebuilt if sys.path has changed."""
+    path = tuple(sys.path)
+    with _lock:
+        if _index['path'] != path:
+            _index['versions'], _index['urls'] = _build()
+            _index['path'] = path
+        return _index
+
+
+def _keys(name):
+    """Keys to look for in index: top-level module name, then dist name."""
+    return name.split('.')[0], _normalize(name)
+
+
+def version(name):
+    """Version of installed package from its (module) or distribution name.
+
+    INPUT
+    -----
+    - name: str, module name (e.g. 'yaml', 'numpy.linalg') or distribution
+      name (e.g. 'PyYAML').
+
+    OUTPUT
+    ------
+    str of version.
+
+    Raises importlib_metadata.PackageNotFoundError if not found.
+    """
+    versions = _get_index()['versions']
+
+    for key in _keys(name):
+        try:
+            return versions[key]
+        except KeyError:
+            pass
+
+    import importlib_metadata
+    raise importlib_metadata.PackageNotFoundError(name)
+
+
+def direct_url(name):
+    """PEP 610 direct_url.json data of the distribution providing name.
+
+    INPUT
+    -----
+    - name: str, module name or distribution name (see version()).
+
+    OUTPUT
+    ------
+    dict, e.g. {'url': 'https://github.com/...', 'vcs_info': {'vcs': 'git',
+    'commit_id': '...'}} or {'url': 'file:///...', 'dir_info':
+    {'editable': True}}; None if package not found or not installed from a
+    direct URL.
+    """
+    urls = _get_index()['urls']
+    for key in _keys(name):
+        if key in urls:
+            return urls[key]
+    return None
+
+
+def editable_path(url_info):
+    """Local folder of an editable install from direct_url() data, or None."""
+    if url_info is None or not url_info.get('dir_info', {}).get('editable'):
+        return None
+    url = urlparse(url_info['url'])
+    if url.scheme != 'file':
+        return None
+    return Path(url2pathname(url.path))
+
+
+def clear_distributions_cache():
+    """Forget index of installed distributions."""
+    with _lock:
+        _index['path'] = None
+        _index['versions'] = {}
+        _index['urls'] = {}
@@ -2,11 +2,26 @@
 
 from pathlib import Path, PurePosixPath
 from datetime import datetime
-import json
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import sysconfig
+import threading
 from copy import copy
 
-import importlib_metadata
-from git import Repo, InvalidGitRepositoryError
+from .cache import get_repo, tracked_paths, working_dir, tag_index
+from .cache import describer, object_reader
+from .discovery import find_dotgit
+from .refs import head_commit_hash
+from . import index
+from . import diskcache
+from . import snapshot
+from . import distributions
+from . import writers
+from . import store
+from . import memo
+
 
 # ============================ Custom exceptions =============================
 
@@ -42,6 +57,55 @@ def _make_iterable(x):
         return x
 
 
+def _check_dirty(repo, path, scope):
+    """Dirty status of whole repo (scope='repo') or path subtree ('path')."""
+    if scope == 'repo':
+        return index.is_dirty(repo)
+    elif scope == 'path':
+        root = Path(repo.working_dir).resolve()
+        return index.is_dirty(repo, path=path.relative_to(root))
+    else:
+        raise ValueError(f"scope must be 'repo' or 'path', not {scope!r}")
+
+
+def _in_tree(pathabs, rootabs, tracked):
+    """Check if resolved path is in set of tracked paths of repo at rootabs"""
+    localpath = pathabs.relative_to(rootabs)  # relative path of file in repo
+    localname = str(PurePosixPath(localpath))  # git uses Unix names
+
+    if localname == '.':  # Means that the entered path is the repo's root
+        return True
+
+    return localname in tracked
+
+
+def _tag_info(tags, describe=None):
+    """Dict with 'tag' (last tag alphabetically), 'tags' if several, and
+    'describe' (nearest tag, see describe()) if not None."""
+    info = {}
+    if tags:
+        info['tag'] = tags[-1]
+    if len(tags) > 1:
+        info['tags'] = list(tags)
+    if describe is not None:
+        info['describe'] = describe
+    return info
+
+
+def _describe(repo, commit_hash):
+    """Describe string of commit, see describe()."""
+    return describer(repo).describe(commit_hash, tag_index(repo),
+                                    read_object=object_reader(repo))
+
+
+def _module_path(module, scope='repo'):
+    """Path used to get status of module (package folder if scope='path')"""
+    path = Path(module.__file__)
+    if scope == 'path' and path.stem == '__init__':
+        return path.parent
+    return path
+
+
 # ============================= Public functions =============================
 
 
@@ -63,23 +127,14 @@ def path_in_tree(path, commit):
     """
 
     pathabs = _pathify(path)
-    rootabs = Path(commit.repo.working_dir).resolve()  # path of root of repo
-
-    localpath = pathabs.relative_to(rootabs)  # relative path of file in repo
-    localname = str(PurePosixPath(localpath))  # gitpython uses Unix names
-
-    if localname == '.':  # Means that the entered path is the repo's root
-        return True
+    rootabs = working_dir(commit.repo.working_dir)  # path of root of repo
 
-    try:
-        commit.tree[localname]
-    except KeyError:  # in this case the file is not in the commit
-        return False
-    else:
-        return True
+    # set of all paths in commit, computed once per commit and cached
+    return _in_tree(pathabs, rootabs, tracked_paths(commit))
 
 
-def current_commit_hash(path='.', checkdirty=True, checktree=True):
+def current_commit_hash(path='.', checkdirty=True, checktree=True,
+                        scope='repo'):
     """Return HEAD commit hash corresponding to path if it's in a git repo.
 
     INPUT
@@ -88,15 +143,24 @@ def current_commit_hash(path='.', checkdirty=True, checktree=True):
     - checkdirty: bool, if True exception raised if repo has uncommitted changes.
     - checktree: bool, if True exception raised if path/file not in repo's
     working tree and path is not the root directory of the repo.
+    - scope: 'repo' (default) or 'path'; if 'path', checkdirty only considers
+    changes within path (file or folder) instead of the whole repository.
 
     OUTPUT
     ------
     - str of the commit's hash name.
+
+    Note: if checkdirty and checktree are both False, the hash is read
+    directly from the files in the .git directory, without gitpython or git.
     """
     p = _pathify(path)
-    repo = Repo(p, search_parent_directories=True)
 
-    if checkdirty and repo.is_dirty():
+    if not checkdirty and not checktree:
+        return head_commit_hash(find_dotgit(p))
+
+    repo = get_repo(p)
+
+    if checkdirty and _check_dirty(repo, p, scope):
         raise DirtyRepo("Dirty repo, please commit recent changes first.")
 
     commit = repo.head.commit
@@ -117,14 +181,169 @@ def repo_tags(path='.'):
     OUTPUT
     ------
     dict  {'commit hash': 'tag name'} (both key and value are str).
+
+    Note: tags are read from the packed-refs file and from refs/tags directly;
+    git objects are only read for annotated tags whose commit is not recorded
+    in packed-refs. If several tags point to the same commit, only the last
+    one (alphabetically) is kept, see commit_tags() to get all of them.
+    """
+    p = _pathify(path)
+    repo = get_repo(p)
+
+    tags = tag_index(repo).tags
+
+    return {commit: tag for tag, commit in tags.items()}
+
+
+def commit_tags(path='.', commit=None):
+    """Return list of all tags pointing at commit (default: HEAD).
+
+    Uses an index {commit: tags} which is cached and only rebuilt when tags
+    change in the repository.
+
+    INPUT
+    -----
+    - path: str or path object of folder/file. Default: current working dir.
+    - commit: str of commit hash (if None, HEAD commit of repo).
+
+    OUTPUT
+    ------
+    list of tag names (str), sorted alphabetically (empty if no tags).
+    """
+    p = _pathify(path)
+    repo = get_repo(p)
+
+    if commit is None:
+        commit = repo.head.commit.hexsha
+
+    return list(tag_index(repo).tags_for(commit))
+
+
+def describe(path='.', commit=None):
+    """Describe commit (default: HEAD) with the nearest tag in its history.
+
+    Similar to 'git describe --tags': returns e.g. 'v1.4.2-17-gabc1234' if
+    the commit is 17 commits after tag v1.4.2, or 'v1.4.2' if the commit is
+    tagged. The search walks the commit ancestry (using the commit-graph file
+    if present, whose generation numbers stop the walk when no tag can be
+    reached anymore) for at most ancestry.MAX_COMMITS commits, and results
+    are memoized per commit. Returns None without walking if the repo has no
+    tags.
+
+    INPUT
+    -----
+    - path: str or path object of folder/file. Default: current working dir.
+    - commit: str of commit hash (if None, HEAD commit of repo).
+
+    OUTPUT
+    ------
+    str, or None if no tag found.
     """
     p = _pathify(path)
-    repo = Repo(p, search_parent_directories=True)
+    repo = get_repo(p)
+
+    if commit is None:
+        commit = repo.head.commit.hexsha
+
+    return _describe(repo, commit)
+
+
+class RepoStatus:
+    """Snapshot of the git status of a path, computed in a single pass.
+
+    The repository is opened once (see cache.get_repo) and the HEAD commit
+    hash, dirty flag, tree membership of the path and tag at HEAD are
+    computed together, with a single dirty check and without enumerating
+    all tags of the repo.
+
+    Attributes
+    ----------
+    - path: fully resolved path object
+    - repo: *gitpython* Repo object
+    - hash: str of HEAD commit hash
+    - dirty: bool, True if repo (or path if scope='path') has uncommitted
+      changes
+    - in_tree: bool, True if path is in HEAD commit's working tree
+    - tags: tuple of all tag names at HEAD commit, sorted alphabetically
+    - tag: str of last tag name at HEAD commit (None if no tag)
+    - describe: str describing HEAD from the nearest tag, e.g.
+      'v1.4.2-17-gabc1234' (None if no tag found), see describe()
+
+    If dirty is not None, it is used as the dirty flag instead of checking
+    the repo again, e.g. when it is shared by several paths of the same repo.
+    """
+
+    def __init__(self, path='.', scope='repo', dirty=None):
+        self.path = _pathify(path)
+        self.repo = get_repo(self.path)
+
+        if dirty is None:
+            dirty = _check_dirty(self.repo, self.path, scope)
+        self.dirty = dirty
+
+        if diskcache.cache_folder() is None:
+            self._get_info()
+        else:
+            self._get_info_from_disk_cache()
+
+        self.tag = self.tags[-1] if self.tags else None
+
+    def _get_info(self):
+        """Get hash, tree membership, tags and describe info from repo."""
+        commit = self.repo.head.commit
+        self.hash = str(commit)
+        self.in_tree = path_in_tree(self.path, commit)
+        self.tags = tag_index(self.repo).tags_for(self.hash)
+        self.describe = _describe(self.repo, self.hash)
+
+    def _get_info_from_disk_cache(self):
+        """Same as _get_info(), but using / updating the on-disk cache."""
+        gitdir = self.repo.git_dir
+        fingerprint = diskcache.fingerprint(gitdir, self.repo.common_dir)
+        localname = self.path.relative_to(working_dir(self.repo.working_dir))
+        localname = str(PurePosixPath(localname))
+
+        data = diskcache.load(gitdir, fingerprint)
+
+        if data is None:
+            self._get_info()
+            data = {'hash': self.hash,
+                    'tags': self.tags,
+                    'describe': self.describe,
+                    'in_tree': {localname: self.in_tree}}
+            diskcache.save(gitdir, fingerprint, data)
+            return
+
+        self.hash = data['hash']
+        self.tags = tuple(data['tags'])
+        self.describe = data['describe']
+
+        try:
+            self.in_tree = data['in_tree'][localname]
+        except KeyError:
+            self.in_tree = path_in_tree(self.path, self.repo.commit(self.hash))
+            data['in_tree'][localname] = self.in_tree
+            diskcache.save(gitdir, fingerprint, data)
+
+    @property
+    def status(self):
+        return 'dirty' if self.dirty else 'clean'
+
+    def to_dict(self):
+        """Dictionary with keys 'hash', 'status', 'tag' (if exists).
 
-    return {str(tag.commit): str(tag) for tag in repo.tags}
+        If several tags point at HEAD, they are all listed in a 'tags' key,
+        and if a tag is found in the history, a 'describe' key is added.
+        """
+        info = {'hash': self.hash, 'status': self.status}
+        info.update(_tag_info(self.tags, self.describe))
+        return info
 
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.to_dict()})'
 
-def path_status(path='.'):
+
+def path_status(path='.', scope='repo'):
     """Current (HEAD) commit hashes, status (dirty or clean), and potential tag.
 
     Slightly higher level compared to current_commit_hash, as it returns a
@@ -133,42 +352,233 @@ def path_status(path='.'):
     INPUT
     -----
     - path: str or path object of folder/file. Default: current working dir.
+    - scope: 'repo' (default) or 'path'; if 'path', status is 'dirty' only if
+      there are changes within path (file or folder).
 
     OUTPUT
     ------
-    Dictionary keys 'hash', 'status' (clean/diry), 'tag' (if exists)
+    Dictionary keys 'hash', 'status' (clean/diry), 'tag' (if exists),
+    'tags' (list of all tags) if several tags point at the current commit,
+    and 'describe' (e.g. 'v1.4.2-17-gabc1234') if a tag is found in history.
     """
-    info = {}
+    rs = RepoStatus(path, scope=scope)
 
-    # get commit hash and check repo status (dirty or clean) -----------------
-    try:
-        cch = current_commit_hash(path, checkdirty=True)
-    except DirtyRepo:
-        cch = current_commit_hash(path, checkdirty=False)
-        status = 'dirty'
-    else:
-        status = 'clean'
+    if not rs.in_tree:
+        raise NotInTree("Path or file not in working tree.")
 
-    info['hash'] = cch
-    info['status'] = status
+    return rs.to_dict()
 
-    # check if tag associated with commit ------------------------------------
-    commits_with_tags = repo_tags(path)
-    if cch in commits_with_tags:
-        info['tag'] = commits_with_tags[cch]
 
-    return info
+def paths_status(paths, scope='repo', nogit_ok=False):
+    """Status (hash, dirty/clean, tag, tree membership) of many paths at once.
+
+    Paths are grouped by repository, and each repository is resolved once
+    (one HEAD lookup, one dirty check if scope='repo', one tag lookup, one
+    listing of tracked paths), which is much faster than calling
+    path_status() on each path.
+
+    INPUT
+    -----
+    - paths: iterable of str or path objects of folders/files.
+    - scope: 'repo' (default) or 'path', see path_status().
+    - nogit_ok: if True, paths not in a git repository get the status
+      'not a git repository' instead of raising InvalidGitRepositoryError.
+
+    OUTPUT
+    ------
+    Dictionary {path: info} where path is as given in input and info is
+    a dictionary with keys 'hash', 'status' (clean/dirty), 'in_tree' (bool)
+    and 'tag' (if exists), similar to path_status(); contrary to
+    path_status(), no NotInTree exception is raised.
+    """
+    paths = list(paths)
+    results = dict.fromkeys(paths)  # to keep order of input
+    repos = {}  # {.git path: [(input path, resolved path)]}
+
+    for path in paths:
+        pathabs = _pathify(path)
+        dotgit = find_dotgit(pathabs, missing_ok=nogit_ok)
+        if dotgit is None:
+            results[path] = {'status': 'not a git repository'}
+        else:
+            repos.setdefault(dotgit, []).append((path, pathabs))
+
+    for members in repos.values():
+
+        repo = get_repo(members[0][1])
+        commit = repo.head.commit
+        rootabs = working_dir(repo.working_dir)
+        tracked = tracked_paths(commit)
+
+        info = {'hash': commit.hexsha}
+        tag_info = _tag_info(tag_index(repo).tags_for(commit.hexsha),
+                             _describe(repo, commit.hexsha))
+
+        if scope == 'repo':
+            repo_dirty = _check_dirty(repo, rootabs, scope)
+
+        for path, pathabs in members:
+
+            if scope == 'repo':
+                dirty = repo_dirty
+            else:
+                dirty = _check_dirty(repo, pathabs, scope)
+
+            results[path] = {**info,
+                             'status': 'dirty' if dirty else 'clean',
+                             'in_tree': _in_tree(pathabs, rootabs, tracked),
+                             **tag_info}
+
+    return results
 
 
 # ================== Functions for status of python modules ==================
 
 
+def _module_version(module):
+    """Version of module (__version__ or version of installed distribution),
+    None if not found."""
+    try:
+        return str(module.__version__)
+    except AttributeError:
+        pass
+    try:
+        return distributions.version(module.__name__)
+    except ImportError:  # importlib_metadata.PackageNotFoundError
+        return None
+
+
+def _vcs_install_info(module, url_info):
+    """Status info of module installed from VCS URL (PEP 610 direct_url)."""
+    vcs_info = url_info['vcs_info']
+    info = {'hash': vcs_info['commit_id'],
+            'status': 'installed from vcs',
+            'url': url_info['url']}
+    if vcs_info.get('vcs', 'git') != 'git':
+        info['vcs'] = vcs_info['vcs']
+    version = _module_version(module)
+    if version is not None:
+        info['tag'] = 'v' + version
+    return info
+
+
+@lru_cache(maxsize=1)
+def _stdlib_folders():
+    """Folders of standard library (without site-packages)."""
+    folders = {sysconfig.get_paths()[name] for name in ('stdlib', 'platstdlib')}
+    return tuple(str(Path(folder).resolve()) + os.sep for folder in folders)
+
+
+def _loaded_packages():
+    """Top-level modules / packages in sys.modules, except stdlib & builtins.
+
+    Submodules are skipped since they have the same status as their
+    top-level package.
+    """
+    stdlib_names = getattr(sys, 'stdlib_module_names', frozenset())  # 3.10+
+    stdlib_folders = _stdlib_folders()
+    packages = []
+
+    for name, module in list(sys.modules.items()):
+
+        if '.' in name or name == '__main__' or name in stdlib_names:
+            continue
+
+        file = getattr(module, '__file__', None)
+        if file is None:  # builtins, namespace packages
+            continue
+
+        file = str(Path(file).resolve())
+        if file.startswith(stdlib_folders) and 'site-packages' not in file:
+            continue
+
+        packages.append(module)
+
+    return sorted(packages, key=lambda module: module.__name__)
+
+
+def _group_status(members, scope, checktree=True):
+    """path_status() of (name, path) members all in the same repository.
+
+    The repo-wide dirty check (scope='repo') is done only once for the group.
+    If checktree is False, members not in the working tree get an 'in_tree'
+    key (False) instead of raising NotInTree. Returns dict {name: info}.
+    """
+    results = {}
+    dirty = None
+
+    for name, path in members:
+
+        rs = RepoStatus(path, scope=scope, dirty=dirty)
+
+        if scope == 'repo':
+            dirty = rs.dirty
+
+        results[name] = rs.to_dict()
+
+        if not rs.in_tree:
+            if checktree:
+                raise NotInTree(f"{path} not in working tree.")
+            results[name]['in_tree'] = False
+
+    return results
+
+
+def _groups_status(groups, scope, checktree=True, max_workers=None):
+    """Status of groups of paths (one group per repo), in parallel threads.
+
+    Git work is mostly subprocess / IO bound, so that independent repos can
+    be processed concurrently; returns dict {name: info}.
+    """
+    groups = list(groups)
+    results = {}
+
+    if len(groups) < 2 or max_workers == 1:
+        for members in groups:
+            results.update(_group_status(members, scope, checktree))
+        return results
+
+    executor = _executor(max_workers)
+    futures = [executor.submit(_group_status, members, scope, checktree)
+               for members in groups]
+    for future in futures:
+        results.update(future.result())
+
+    return results
+
+
+_executors = {}  # {max_workers: (ThreadPoolExecutor, pid of creator)}
+_executors_lock = threading.Lock()
+
+
+def _executor(max_workers):
+    """Thread pool shared by calls of _groups_status().
+
+    Worker threads persist between calls, so that they keep their cached
+    Repo objects (one per thread, see cache.RepoCache) and the associated
+    git processes. A new pool is created in forked processes, where the
+    threads of the parent's pool do not exist.
+    """
+    pid = os.getpid()
+    with _executors_lock:
+        executor, creator = _executors.get(max_workers, (None, None))
+        if executor is None or creator != pid:
+            executor = ThreadPoolExecutor(max_workers=max_workers,
+                                          thread_name_prefix='gittools')
+            _executors[max_workers] = executor, pid
+    return executor
+
+
 def module_status(module,
                   dirty_warning=False,
                   dirty_ok=True,
                   notag_warning=False,
                   nogit_ok=False,
-                  nogit_warning=False):
+                  nogit_warning=False,
+                  scope='repo',
+                  max_workers=None,
+                  checktree=True,
+                  status_ttl=0):
     """Get status info (current hash, dirty/clean repo, tag) of module(s).
 
     Parameters
@@ -178,40 +588,110 @@ def module_status(module,
     - dirty_ok: if False, raise an error if module(s) is/are dirty.
     - notag_warning: if True, prints a warning if some git repos don't have tags
     - nogit_ok: if True, if some modules are not in a git repo, simply get
-      their version number. If False (default), raise an error.
+      their version number (module's __version__ or version of the installed
+      distribution providing it, see distributions.py). If False (default),
+      raise an error. Note that modules installed from a VCS URL (e.g. pip
+      install git+https://...) are not considered as without git: their
+      commit is read from the direct_url.json file of the distribution
+      (PEP 610), with status 'installed from vcs'; modules installed in
+      editable mode from a local repository get the status of that repo.
     - nogit_warning: if some modules are not in a git repo and nogit_ok is True,
       print a warning when this happens.
+    - scope: 'repo' (default) or 'path'; if 'path', a module is considered
+      dirty only if there are changes within its package folder (or its file
+      for single-file modules), e.g. for modules living in a monorepo.
+    - max_workers: max number of threads used to get the status of modules
+      in different repositories concurrently (default: see
+      concurrent.futures.ThreadPoolExecutor); 1 to use no thread.
+    - checktree: if True (default), raise NotInTree if a module file is not
+      in the working tree of its repo (e.g. untracked); if False, the info
+      of such modules has an additional 'in_tree' key set to False.
+    - status_ttl: if > 0, the result of a previous call with the same modules
+      and options made less than status_ttl seconds ago is reused, as long
+      as the repositories of the modules have not changed (HEAD, refs,
+      index), see memo.py; changes in the working tree made in the meantime
+      are not detected. Warnings and dirty_ok still apply.
 
     Output
     ------
     Dict with module name as keys, and a dict {hash:, status:, tag:} as values
+
+    Note: modules are grouped by repository, so that the status of a repo
+    (e.g. dirty check) is computed once even if many modules belong to it,
+    and different repos are processed concurrently.
+
+    Note: if a status snapshot was exported by a parent process (see
+    export_status()), the status of modules is taken from it as long as their
+    repository has not changed (no new commit, no change in refs or index).
     """
-    modules = _make_iterable(module)
+    modules = tuple(_make_iterable(module))
+    options = {'nogit_ok': nogit_ok, 'scope': scope, 'checktree': checktree}
+
+    def compute():
+        return _modules_info(modules, max_workers=max_workers, **options)
+
+    if status_ttl > 0:
+        mods = memo._status_memo.get(modules, options, status_ttl, compute)
+    else:
+        mods = compute()
+
+    _warn(mods, dirty_warning, dirty_ok, notag_warning, nogit_ok,
+          nogit_warning)
+
+    return mods
+
+
+def _modules_info(modules, nogit_ok, scope, checktree, max_workers):
+    """Dict {module name: info} of module_status(), without warnings."""
+    # gitpython is imported only when needed, to keep 'import gittools' fast
+    # (see __init__.py)
+    from git import InvalidGitRepositoryError
+
     mods = {}  # dict {module name: dict of module info}
+    groups = {}  # {.git path: [(module name, path)]} of modules to query
 
     for module in modules:
 
         name = module.__name__
 
-        try:
-            info = path_status(module.__file__)
-        except InvalidGitRepositoryError:
-            if nogit_ok:
-
-                try:
-                    version = module.__version__
-                except AttributeError:
-                    version = importlib_metadata.version(name)
+        info = snapshot.lookup(module, scope, nogit_ok, checktree)
+        if info is not None:
+            mods[name] = info
+            continue
+
+        path = _pathify(_module_path(module, scope))
+        dotgit = find_dotgit(path, missing_ok=True)
+        url_info = None
+
+        if dotgit is None:  # installed package, see distributions.py
+            url_info = distributions.direct_url(name)
+            local = distributions.editable_path(url_info)
+            if local is not None and local.exists():
+                path = local.resolve()
+                dotgit = find_dotgit(path, missing_ok=True)
+
+        if dotgit is not None:
+            mods[name] = None  # filled below, keeps order of modules
+            groups.setdefault(dotgit, []).append((name, path))
+        elif url_info is not None and 'vcs_info' in url_info:
+            mods[name] = _vcs_install_info(module, url_info)
+        elif nogit_ok:
+            mods[name] = {'status': 'not a git repository'}
+            version = _module_version(module)
+            if version is not None:
+                mods[name]['tag'] = 'v' + version
+
+        else:
+            raise InvalidGitRepositoryError(f'{module} not a git repo')
+
+    mods.update(_groups_status(groups.values(), scope, checktree, max_workers))
 
-                tag = 'v' + version
-                info = {'status': 'not a git repository',
-                        'tag': tag}
+    return mods
 
-            else:
-                raise InvalidGitRepositoryError(f'{module} not a git repo')
-        mods[name] = info
 
-    # Manage warnings if necessary -------------------------------------------
+def _warn(mods, dirty_warning, dirty_ok, notag_warning, nogit_ok,
+          nogit_warning):
+    """Print warnings / raise DirtyRepo on module_status() output."""
 
     if dirty_warning or not dirty_ok:
 
@@ -248,7 +728,119 @@ def module_status(module,
             msg += ', '.join(nogit_modules)
             print(f'{msg}\n')
 
-    return mods
+
+def export_status(module, file=None, nogit_ok=False, scope='repo',
+                  checktree=True):
+    """Compute status of module(s) and export it for child processes.
+
+    The result of module_status() is stored in the GITTOOLS_STATUS
+    environment variable (inherited by subprocesses, multiprocessing workers,
+    srun etc.), and module_status() / save_metadata() in child processes use
+    it instead of querying git again, as long as the repositories of the
+    modules have not changed (HEAD, refs, index) and they are called with the
+    same nogit_ok, scope and checktree options. The current process ignores
+    the snapshot.
+
+    Parameters
+    ----------
+    - module or list/iterable of modules (see module_status())
+    - file: if not None, the snapshot is written into this file, and the
+      environment variable contains '@' followed by the file path (this is
+      done automatically with a temporary file for large snapshots, which
+      is removed when the current process exits).
+    - nogit_ok, scope, checktree: see module_status()
+
+    Output
+    ------
+    str, value of the GITTOOLS_STATUS environment variable, which can also be
+    passed explicitly to processes that do not inherit the environment.
+    """
+    modules = tuple(_make_iterable(module))
+    mods = module_status(modules, nogit_ok=nogit_ok, scope=scope,
+                         checktree=checktree)
+
+    entries = {mod.__name__: snapshot.module_entry(mod,
+                                                   mods[mod.__name__],
+                                                   scope,
+                                                   nogit_ok=nogit_ok,
+                                                   checktree=checktree)
+               for mod in modules}
+
+    return snapshot.dump(entries, file=file)
+
+
+def environment_status(dirty_warning=False,
+                       dirty_ok=True,
+                       notag_warning=False,
+                       nogit_warning=False,
+                       scope='repo',
+                       max_workers=None):
+    """Status of all (non-stdlib) packages imported in the current process.
+
+    Top-level packages are taken from sys.modules (builtins and standard
+    library modules are skipped), and their status is obtained with
+    module_status(..., nogit_ok=True, checktree=False): packages in a git
+    repository are grouped by repo and resolved in parallel, and installed
+    packages get their version (or VCS commit) from the index of installed
+    distributions.
+
+    Parameters
+    ----------
+    - dirty_warning, dirty_ok, notag_warning, nogit_warning, scope,
+      max_workers: see module_status()
+
+    Output
+    ------
+    Dict {top-level package name: info}, sorted by name, see module_status()
+    """
+    return module_status(_loaded_packages(),
+                         dirty_warning=dirty_warning,
+                         dirty_ok=dirty_ok,
+                         notag_warning=notag_warning,
+                         nogit_ok=True,
+                         nogit_warning=nogit_warning,
+                         scope=scope,
+                         max_workers=max_workers,
+                         checktree=False)
+
+
+def _make_metadata(info=None, module=None, time=None, **options):
+    """Metadata dict saved by save_metadata(), without writing it.
+
+    Parameters
+    ----------
+    - info: dict of info (copied)
+    - module: module(s) or 'all', see save_metadata()
+    - time: datetime (UTC) of the record; if None, current time.
+    - options: other keyword arguments of module_status() (dirty_warning,
+      dirty_ok, notag_warning, nogit_ok, nogit_warning, scope, max_workers)
+
+    Output
+    ------
+    Dict: copy of info, with additional 'time (utc)' key and 'code version'
+    key (module_status() output) if module is not None.
+    """
+    metadata = copy(info) if info is not None else {}
+    time = datetime.utcnow() if time is None else time
+    metadata['time (utc)'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    # Info on commit hashes of homemade modules used -------------------------
+    if module == 'all':
+        module = _loaded_packages()
+        options.update(nogit_ok=True, checktree=False)
+
+    if module is not None:
+        metadata['code version'] = module_status(module, **options)
+
+    return metadata
+
+
+def _write_metadata(file, metadata, mode, serializer):
+    """Write metadata dict into file or provenance store (see store.py)."""
+    if store.is_store(file):
+        store.save(file, metadata)
+    else:
+        writers.save(file, metadata, mode=mode, serializer=serializer)
 
 
 def save_metadata(file,
@@ -258,14 +850,25 @@ def save_metadata(file,
                   dirty_ok=True,
                   notag_warning=False,
                   nogit_ok=False,
-                  nogit_warning=False):
+                  nogit_warning=False,
+                  scope='repo',
+                  max_workers=None,
+                  mode='write',
+                  serializer='json',
+                  status_ttl=0):
     """Save metadata (info dict) into json file, and add git commit & time info.
 
     Parameters
     ----------
-    - file: str or path object of .json file to save data into.
+    - file: str or path object of .json file to save data into (.jsonl file
+      if mode='append'), or provenance store to add the metadata to: either
+      a store.ProvenanceStore object, or the path of an SQLite file (suffix
+      .sqlite, .sqlite3 or .db); mode and serializer are then ignored.
     - info: dict of info
-    - module: module or iterable (e.g. list) of modules with git info to save.
+    - module: module or iterable (e.g. list) of modules with git info to save,
+      or 'all' for all packages imported in the process (see
+      environment_status(); nogit_ok is then always True and checktree
+      False, see module_status()).
     - dirty_warning: if True, prints a warning if some git repos are dirty.
     - dirty_ok: if False, raise an error if module(s) is/are dirty.
     - notag_warning: if True, prints a warning if some git repos don't have tags
@@ -273,22 +876,36 @@ def save_metadata(file,
       their version number. If False (default), raise an error.
     - nogit_warning: if some modules are not in a git repo and nogit_ok is True,
       print a warning when this happens.
+    - scope: 'repo' or 'path', see module_status()
+    - max_workers: max number of threads, see module_status()
+    - mode: 'write' (default) to write a pretty-printed JSON file (replaced if
+      it exists), or 'append' to append the metadata as one compact line to
+      a JSON Lines file; appending is safe with many concurrent processes
+      writing to the same file (O_APPEND and advisory lock, see writers.py).
+    - serializer: output format, 'json' (default, pretty-printed; compact
+      lines in append mode), 'compact-json', 'orjson' (requires orjson),
+      'fast' (orjson if installed, else compact-json), 'msgpack' (requires
+      msgpack), or a writers.Serializer instance. NumPy arrays and scalars,
+      paths and datetimes in info are converted automatically.
+    - status_ttl: if > 0, max age (s) of module_status() results reused from
+      previous calls with the same modules, if their repos have not changed
+      (HEAD, refs, index), see module_status(); unstaged changes made in the
+      meantime are then not detected. 0 (default) to always recompute.
     """
-    metadata = copy(info) if info is not None else {}
-    metadata['time (utc)'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-
-    # Info on commit hashes of homemade modules used -------------------------
-    if module is not None:
-        module_info = module_status(module,
-                                    dirty_warning=dirty_warning,
-                                    dirty_ok=dirty_ok,
-                                    notag_warning=notag_warning,
-                                    nogit_ok=nogit_ok,
-                                    nogit_warning=nogit_warning)
-
-        metadata['code version'] = module_info
-
-    # Write to file ----------------------------------------------------------
-    # Note: below, the encoding and ensure_ascii options are for signs like °
-    with open(file, 'w', encoding='utf8') as f:
-        json.dump(metadata, f, indent=4, ensure_ascii=False)
+    if mode not in writers.MODES:
+        raise ValueError(f"mode must be in {writers.MODES}, not {mode!r}")
+
+    serializer = writers.get_serializer(serializer)
+
+    metadata = _make_metadata(info,
+                              module=module,
+                              dirty_warning=dirty_warning,
+                              dirty_ok=dirty_ok,
+                              notag_warning=notag_warning,
+                              nogit_ok=nogit_ok,
+                              nogit_warning=nogit_warning,
+                              scope=scope,
+                              max_workers=max_workers,
+                              status_ttl=status_ttl)
+
+    _write_metadata(file, metadata, mode, serializer)
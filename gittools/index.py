@@ -0,0 +1,516 @@
+"""Read the binary git index and detect changes without spawning git."""
+
+from pathlib import Path, PurePosixPath
+from collections import namedtuple
+import hashlib
+import os
+import stat
+import struct
+
+from .refs import head_commit_hash, read_ref
+from .objects import read_loose_object
+from .cache import commit_graph
+
+
+# ============================ Custom exceptions =============================
+
+
+class UnsupportedIndex(Exception):
+    """Index uses features not handled here (split index, sparse index etc.)"""
+    pass
+
+
+# ============================== Index parsing ===============================
+
+
+IndexEntry = namedtuple('IndexEntry', ['path', 'ctime_s', 'ctime_ns',
+                                       'mtime_s', 'mtime_ns', 'ino', 'mode',
+                                       'size', 'sha', 'flags', 'extflags'])
+
+_HEADER = struct.Struct('>4sII')
+_ENTRY = struct.Struct('>10I20sH')  # ctime(2), mtime(2), dev, ino, mode,
+_EXTFLAGS = struct.Struct('>H')     # uid, gid, size, sha1, flags
+_EXT_HEADER = struct.Struct('>4sI')
+
+SHA_SIZE = 20
+
+# flags
+ASSUME_VALID = 0x8000
+EXTENDED = 0x4000
+STAGE_MASK = 0x3000
+NAME_MASK = 0x0FFF
+
+# extended flags (index v3+)
+SKIP_WORKTREE = 0x4000
+INTENT_TO_ADD = 0x2000
+
+# modes
+GITLINK = 0o160000
+SYMLINK = 0o120000
+
+
+def _varint(data, pos):
+    """Decode git's offset varint (index v4) at pos; return (value, new pos)"""
+    c = data[pos]
+    pos += 1
+    value = c & 0x7F
+    while c & 0x80:
+        value += 1
+        c = data[pos]
+        pos += 1
+        value = (value << 7) + (c & 0x7F)
+    return value, pos
+
+
+def _parse_tree_extension(data):
+    """Parse cache-tree (TREE) extension.
+
+    Returns dict {directory (bytes, b'' for root): tree sha (hex str) or None
+    if the cache-tree entry is invalid}.
+    """
+    trees = {}
+    stack = []  # [(path prefix, number of subtrees left to read)]
+    pos = 0
+
+    while pos < len(data):
+
+        end = data.index(b'\0', pos)
+        name = data[pos:end]
+        pos = end + 1
+
+        end = data.index(b'\n', pos)
+        entry_count, subtrees = (int(x) for x in data[pos:end].split(b' '))
+        pos = end + 1
+
+        if entry_count >= 0:
+            sha = data[pos:pos + SHA_SIZE].hex()
+            pos += SHA_SIZE
+        else:
+            sha = None
+
+        while stack and stack[-1][1] == 0:
+            stack.pop()
+
+        if stack:
+            prefix, left = stack[-1]
+            stack[-1] = prefix, left - 1
+            path = prefix + name if not prefix else prefix + b'/' + name
+        else:
+            path = name
+
+        trees[path] = sha
+        stack.append((path, subtrees))
+
+    return trees
+
+
+def read_index(gitdir):
+    """Parse the index file of a git directory (versions 2, 3 and 4).
+
+    INPUT
+    -----
+    - gitdir: git directory (e.g. .git folder of repo or of worktree)
+
+    OUTPUT
+    ------
+    (entries, trees), where entries is a list of IndexEntry (paths as bytes)
+    and trees the parsed cache-tree extension (see _parse_tree_extension)
+
+    Raises UnsupportedIndex for split indexes, sparse indexes and unknown
+    versions, and FileNotFoundError if there is no index.
+    """
+    data = (Path(gitdir) / 'index').read_bytes()
+
+    signature, version, n = _HEADER.unpack_from(data, 0)
+    if signature != b'DIRC' or version not in (2, 3, 4):
+        raise UnsupportedIndex(f'Index version {version} not supported')
+
+    pos = _HEADER.size
+    entries = []
+    previous = b''
+
+    for _ in range(n):
+
+        start = pos
+        (ctime_s, ctime_ns, mtime_s, mtime_ns, _dev, ino, mode, _uid, _gid,
+         size, sha, flags) = _ENTRY.unpack_from(data, pos)
+        pos += _ENTRY.size
+
+        extflags = 0
+        if flags & EXTENDED:
+            extflags, = _EXTFLAGS.unpack_from(data, pos)
+            pos += _EXTFLAGS.size
+
+        if version == 4:
+            strip, pos = _varint(data, pos)
+            end = data.index(b'\0', pos)
+            path = previous[:len(previous) - strip] + data[pos:end]
+            pos = end + 1
+            previous = path
+        else:
+            namelen = flags & NAME_MASK
+            if namelen < NAME_MASK:
+                end = pos + namelen
+            else:
+                end = data.index(b'\0', pos)
+            path = data[pos:end]
+            pos = start + ((end - start) // 8 + 1) * 8  # 1-8 NUL padding
+
+        entries.append(IndexEntry(path, ctime_s, ctime_ns, mtime_s, mtime_ns,
+                                  ino, mode, size, sha, flags, extflags))
+
+    trees = {}
+
+    while pos + _EXT_HEADER.size <= len(data) - SHA_SIZE:
+        ext, length = _EXT_HEADER.unpack_from(data, pos)
+        pos += _EXT_HEADER.size
+        if ext == b'TREE':
+            trees = _parse_tree_extension(data[pos:pos + length])
+        elif ext in (b'link', b'sdir'):
+            raise UnsupportedIndex(f'Index extension {ext} not supported')
+        pos += length
+
+    return entries, trees
+
+
+# ========================== Working tree changes ============================
+
+
+def blob_hash(data):
+    """git hash-object of bytes data (sha1 hex str)"""
+    header = f'blob {len(data)}\0'.encode()
+    return hashlib.sha1(header + data).hexdigest()
+
+
+def _stat_matches(entry, st, trustctime):
+    """Compare cached stat data of index entry with os.stat_result."""
+    if entry.mtime_s != int(st.st_mtime):
+        return False
+    if entry.mtime_ns and entry.mtime_ns != st.st_mtime_ns % 1000000000:
+        return False
+    if trustctime:
+        if entry.ctime_s != int(st.st_ctime):
+            return False
+        if entry.ctime_ns and entry.ctime_ns != st.st_ctime_ns % 1000000000:
+            return False
+    return (entry.ino == st.st_ino & 0xFFFFFFFF
+            and entry.size == st.st_size & 0xFFFFFFFF)
+
+
+def _is_racy(entry, index_stat):
+    """Entry modified in the same timestamp as index written (see git racy)"""
+    index_s = int(index_stat.st_mtime)
+    index_ns = index_stat.st_mtime_ns % 1000000000
+    return (entry.mtime_s, entry.mtime_ns) >= (index_s, index_ns)
+
+
+def _content_changed(entry, file, st):
+    """Compare file contents with blob hash of index entry."""
+    if stat.S_ISLNK(st.st_mode):
+        data = os.fsencode(os.readlink(file))
+    else:
+        if entry.size != st.st_size & 0xFFFFFFFF:
+            return True
+        with open(file, 'rb') as f:
+            data = f.read()
+    return blob_hash(data) != entry.sha.hex()
+
+
+def _gitlink_changed(entry, file):
+    """Submodule: compare its HEAD with recorded commit (if checked out)."""
+    dotgit = Path(file) / '.git'
+    if not dotgit.exists():  # submodule not initialized
+        return False
+    try:
+        return head_commit_hash(dotgit) != entry.sha.hex()
+    except (OSError, ValueError):
+        return True
+
+
+def entry_changed(entry, root, index_stat, filemode=True, trustctime=True):
+    """Return True if index entry differs from working tree file.
+
+    Stat data (mtime, ctime, size, inode, mode) is compared first; contents
+    are hashed only if stat data does not match or if the entry is racily
+    clean (file modified in the same timestamp as the index was written).
+    """
+    if entry.flags & STAGE_MASK:  # merge conflict
+        return True
+
+    if entry.flags & ASSUME_VALID or entry.extflags & SKIP_WORKTREE:
+        return False
+
+    if entry.extflags & INTENT_TO_ADD:
+        return True
+
+    file = os.path.join(root, os.fsdecode(entry.path))
+
+    if entry.mode == GITLINK:
+        return _gitlink_changed(entry, file)
+
+    try:
+        st = os.lstat(file)
+    except (FileNotFoundError, NotADirectoryError):
+        return True
+
+    if entry.mode & 0o170000 == SYMLINK:
+        if not stat.S_ISLNK(st.st_mode):
+            return True
+    else:
+        if not stat.S_ISREG(st.st_mode):
+            return True
+        if filemode and (st.st_mode & 0o100) != (entry.mode & 0o100):
+            return True
+
+    if _stat_matches(entry, st, trustctime) and not _is_racy(entry, index_stat):
+        return False
+
+    return _content_changed(entry, file, st)
+
+
+def worktree_changes(gitdir, root, filemode=True, trustctime=True):
+    """List of index entries whose working tree file has changed.
+
+    INPUTS
+    ------
+    - gitdir: git directory of repo / worktree (containing the index)
+    - root: working tree root directory
+    - filemode, trustctime: values of core.fileMode and core.trustCtime
+
+    OUTPUT
+    ------
+    list of paths (bytes, relative to root, unix-style) of changed entries.
+    """
+    entries, _ = read_index(gitdir)
+    index_stat = os.stat(Path(gitdir) / 'index')
+    return _changed_paths(entries, root, index_stat, filemode, trustctime)
+
+
+def _iter_changed_paths(entries, root, index_stat, filemode, trustctime):
+    root = os.fspath(root)
+    return (entry.path for entry in entries
+            if entry_changed(entry, root, index_stat, filemode, trustctime))
+
+
+def _changed_paths(entries, root, index_stat, filemode, trustctime):
+    return list(_iter_changed_paths(entries, root, index_stat, filemode,
+                                    trustctime))
+
+
+# ============================= Dirty detection ==============================
+
+
+def _uses_filters(repo, entries):
+    """True if content filters (eol conversion, attributes) may apply.
+
+    In that case, the hash of the working tree file can legitimately differ
+    from the blob hash without the file being modified.
+    """
+    config = repo.config_reader()
+    if config.get_value('core', 'autocrlf', False) not in (False, 'false'):
+        return True
+    if (Path(repo.common_dir) / 'info' / 'attributes').exists():
+        return True
+    return any(e.path.rsplit(b'/', 1)[-1] == b'.gitattributes'
+               for e in entries)
+
+
+def _git_is_dirty(repo, index=True, working_tree=True, path=None,
+                  quick=True):
+    """Dirty check with git, stopping at first change if quick is True.
+
+    quick uses the exit code of 'git diff --quiet' (no output generated),
+    otherwise the check is done by gitpython (repo.is_dirty()).
+    """
+    if not quick:
+        return repo.is_dirty(index=index, working_tree=working_tree,
+                             path=path)
+
+    pathspec = () if path is None else ('--', path)
+    diffs = []
+    if index:
+        diffs.append(('--cached',))
+    if working_tree:
+        diffs.append(())
+
+    for options in diffs:
+        args = ('--quiet',) + options + pathspec
+        status, _, _ = repo.git.diff(*args, with_extended_output=True,
+                                     with_exceptions=False)
+        if status == 1:
+            return True
+        elif status != 0:  # error (e.g. no HEAD): let gitpython deal with it
+            return repo.is_dirty(index=index, working_tree=working_tree,
+                                 path=path)
+
+    return False
+
+
+def _in_scope(entry_path, prefix):
+    """True if index entry path is prefix or within prefix (None: all)."""
+    return (prefix is None or entry_path == prefix
+            or entry_path.startswith(prefix + b'/'))
+
+
+def _read_object(repo, sha):
+    """(type, data) of object, read directly if loose, else with gitpython."""
+    obj = read_loose_object(repo.common_dir, sha)
+    if obj is None:  # packed object
+        ostream = repo.odb.stream(bytes.fromhex(sha))
+        obj = ostream.type.decode(), ostream.read()
+    return obj
+
+
+def _head_tree(repo):
+    """Hash of root tree of HEAD commit (None if no commit yet).
+
+    Read from the commit-graph file if HEAD is in it, otherwise from the
+    commit object.
+    """
+    try:
+        sha = read_ref('HEAD', repo.git_dir, repo.common_dir)
+    except ValueError:  # e.g. branch without commits
+        return None
+
+    graph = commit_graph(repo)
+    pos = None if graph is None else graph.position(sha)
+    if pos is not None:
+        return graph.tree(pos)
+
+    _, data = _read_object(repo, sha)
+    return data[len(b'tree '):data.index(b'\n')].decode()
+
+
+def _tree_entry(data, name):
+    """(mode, hash) of entry name (bytes) in tree object data, or None."""
+    start = 0
+    while start < len(data):
+        space = data.index(b' ', start)
+        end = data.index(b'\0', space)
+        if data[space + 1:end] == name:
+            return int(data[start:space], 8), data[end + 1:end + 21].hex()
+        start = end + 21
+    return None
+
+
+def _head_object(repo, prefix):
+    """(mode, hash) of object (tree or blob) of HEAD at prefix (root if None).
+
+    Objects are read directly when loose (gitpython is used only for packed
+    objects). Returns None if prefix does not exist in HEAD.
+    """
+    tree = _head_tree(repo)
+    if tree is None:
+        return None
+    obj = stat.S_IFDIR, tree
+    if prefix is None:
+        return obj
+    for name in prefix.split(b'/'):
+        mode, sha = obj
+        if not stat.S_ISDIR(mode):
+            return None
+        obj = _tree_entry(_read_object(repo, sha)[1], name)
+        if obj is None:
+            return None
+    return obj
+
+
+def _index_matches_head(repo, entries, trees, prefix=None):
+    """True/False if index matches HEAD (within prefix), None if unknown.
+
+    Uses the cache-tree extension for directories: if its entry is valid,
+    its sha is the tree that would be committed from the current index.
+    Single files are compared directly with the corresponding HEAD blob.
+    """
+    key = b'' if prefix is None else prefix
+
+    if key in trees:
+        if trees[key] is None:  # invalidated cache-tree entry
+            return None
+        obj = _head_object(repo, prefix)
+        return obj is not None and trees[key] == obj[1]
+
+    scoped = [e for e in entries if _in_scope(e.path, prefix)]
+
+    if not scoped:
+        return _head_object(repo, prefix) is None
+
+    if len(scoped) == 1 and scoped[0].path == prefix:
+        entry, = scoped
+        obj = _head_object(repo, prefix)
+        return (obj is not None and not entry.flags & STAGE_MASK
+                and entry.sha.hex() == obj[1] and entry.mode == obj[0])
+
+    return None
+
+
+def _scope_prefix(path):
+    """Relative path (str or path object) in repo to unix-style bytes."""
+    if path is None:
+        return None
+    name = PurePosixPath(Path(path)).as_posix()
+    return None if name == '.' else os.fsencode(name)
+
+
+def is_dirty(repo, path=None, quick=True):
+    """Native equivalent of repo.is_dirty() (gitpython), without git calls.
+
+    Considers the repo dirty if the index differs from HEAD (staged changes)
+    or if tracked files of the working tree differ from the index; untracked
+    files are ignored, as in repo.is_dirty().
+
+    Falls back to repo.is_dirty() when the index is not supported, and asks
+    git to confirm when the native check finds changes while content filters
+    (autocrlf, .gitattributes) may be active.
+
+    INPUTS
+    ------
+    - repo: *gitpython* Repo object
+    - path: if not None, only changes within this path (relative to the root
+      of the working tree, file or folder) are considered.
+    - quick: if True (default), stop at the first modified path found
+      (and use 'git diff --quiet' when git is needed); if False, compare all
+      files and use repo.is_dirty() for git fallbacks.
+
+    OUTPUT
+    ------
+    bool
+    """
+    gitdir = Path(repo.git_dir)
+    prefix = _scope_prefix(path)
+    gitpath = None if prefix is None else os.fsdecode(prefix)
+
+    try:
+        entries, trees = read_index(gitdir)
+        index_stat = os.stat(gitdir / 'index')
+    except (UnsupportedIndex, FileNotFoundError, struct.error, ValueError):
+        return _git_is_dirty(repo, path=gitpath, quick=quick)
+
+    config = repo.config_reader()
+    filemode = config.get_value('core', 'filemode', True)
+    trustctime = config.get_value('core', 'trustctime', True)
+
+    # Staged changes (index vs HEAD) -----------------------------------------
+    index_matches_head = _index_matches_head(repo, entries, trees, prefix)
+
+    if index_matches_head is None:
+        if _git_is_dirty(repo, working_tree=False, path=gitpath,
+                         quick=quick):
+            return True
+    elif not index_matches_head:
+        return True
+
+    # Unstaged changes (working tree vs index) -------------------------------
+    scoped = (e for e in entries if _in_scope(e.path, prefix))
+    changes = _iter_changed_paths(scoped, repo.working_tree_dir, index_stat,
+                                  filemode, trustctime)
+
+    if quick:
+        changed = next(changes, None) is not None
+    else:
+        changed = len(list(changes)) > 0
+
+    if changed and _uses_filters(repo, entries):
+        return _git_is_dirty(repo, index=False, path=gitpath, quick=quick)
+
+    return changed
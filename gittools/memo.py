@@ -0,0 +1,99 @@
+"""Per-process memoization of module_status() results.
+
+Results are stored per set of modules and options, with the time they were
+computed and the fingerprints of the repositories of the modules (HEAD,
+refs, packed-refs, index, see diskcache.fingerprint()). A result is reused
+if it is younger than the requested TTL (time to live) and if fingerprints
+still match (a few stat calls, no git call).
+
+Note: changes in the working tree that do not modify the index are not
+reflected in fingerprints, so that a repo that becomes dirty can be
+reported as clean for at most TTL seconds.
+"""
+
+from collections import OrderedDict
+from copy import deepcopy
+from pathlib import Path
+import threading
+import time
+
+from .snapshot import repo_fingerprint
+
+
+MAX_SIZE = 64  # max number of module sets memoized
+
+
+def _fingerprints(modules):
+    """Fingerprints of repos of modules (computed once per module file)."""
+    prints = {}
+    for module in modules:
+        file = getattr(module, '__file__', None)
+        if file is not None and file not in prints:
+            prints[file] = repo_fingerprint(Path(file).resolve())
+    return prints
+
+
+class StatusMemo:
+    """Memoized module_status() results, revalidated by repo fingerprints."""
+
+    def __init__(self, maxsize=MAX_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # {key: (time, fingerprints, result)}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(modules, options):
+        names = tuple((module.__name__, getattr(module, '__file__', None))
+                      for module in modules)
+        return names, tuple(sorted(options.items()))
+
+    def get(self, modules, options, ttl, compute):
+        """Return compute() result, reused if possible.
+
+        INPUTS
+        ------
+        - modules: sequence of modules
+        - options: dict of options (hashable values) the result depends on
+        - ttl: max age (s) of reused results
+        - compute: function without arguments, returning the result
+
+        OUTPUT
+        ------
+        result (a copy, that can be modified by the caller)
+        """
+        key = self._key(modules, options)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._data.get(key)
+
+        if entry is not None:
+            computed, prints, result = entry
+            if now - computed < ttl and prints == _fingerprints(modules):
+                with self._lock:
+                    if key in self._data:
+                        self._data.move_to_end(key)
+                return deepcopy(result)
+
+        prints = _fingerprints(modules)  # before, so that changes are seen
+        result = compute()
+
+        with self._lock:
+            self._data[key] = now, prints, deepcopy(result)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_status_memo = StatusMemo()
+
+
+def clear_status_memo():
+    """Forget memoized module_status() results."""
+    _status_memo.clear()
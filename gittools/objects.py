@@ -0,0 +1,49 @@
+"""Read loose git objects directly from the filesystem (no git call)."""
+
+from pathlib import Path
+import zlib
+
+
+def read_loose_object(commondir, sha, size=None):
+    """Return (type, data) of loose object, or None if object is not loose.
+
+    INPUTS
+    ------
+    - commondir: common git directory (containing the objects folder)
+    - sha: hex str of object hash
+    - size: if not None, only (at least) the first size bytes of the
+      decompressed data are returned, e.g. to read headers of large objects.
+
+    OUTPUT
+    ------
+    (type, data): type is str ('commit', 'tag', 'tree', 'blob'), data bytes.
+
+    Objects that are in pack files (or in alternates) are not read and None
+    is returned; use the object database of gitpython for these.
+    """
+    file = Path(commondir) / 'objects' / sha[:2] / sha[2:]
+    try:
+        raw = file.read_bytes()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+    decompressor = zlib.decompressobj()
+    if size is None:
+        content = decompressor.decompress(raw)
+    else:
+        content = decompressor.decompress(raw, size + 32)  # 32 for header
+
+    header, _, data = content.partition(b'\0')
+    obj_type, _, _ = header.partition(b' ')
+    return obj_type.decode(), data
+
+
+def tag_target(data):
+    """(hash, type) of the object a tag object points to (data: bytes of tag)
+
+    Tag objects start with 'object <hash>' and 'type <type>' lines.
+    """
+    lines = data.split(b'\n', 2)
+    sha = lines[0][len(b'object '):].decode()
+    obj_type = lines[1][len(b'type '):].decode()
+    return sha, obj_type
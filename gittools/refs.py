@@ -0,0 +1,426 @@
+"""Read git directories and refs directly from the filesystem (no git call)."""
+
+from pathlib import Path
+import os
+import threading
+
+from .objects import read_loose_object, tag_target
+
+
+# Refs that are specific to each worktree (stored in the worktree's gitdir
+# rather than in the common dir shared by all worktrees)
+PER_WORKTREE_REFS = ('HEAD', 'refs/bisect/', 'refs/worktree/',
+                     'refs/rewritten/')
+
+MAX_SYMREF_DEPTH = 5
+
+
+# ============================ Git directories ===============================
+
+
+def git_dir(dotgit):
+    """Return actual git directory from .git entry (folder or gitdir: file).
+
+    Worktrees and submodules use a .git file containing 'gitdir: <path>',
+    where path can be relative to the folder containing the .git file.
+    """
+    dotgit = Path(dotgit)
+    if dotgit.is_dir():
+        return dotgit
+
+    content = dotgit.read_text().strip()
+    if not content.startswith('gitdir:'):
+        raise ValueError(f'{dotgit} is not a valid .git file')
+
+    gitdir = Path(content[len('gitdir:'):].strip())
+    if not gitdir.is_absolute():
+        gitdir = dotgit.parent / gitdir
+
+    return gitdir.resolve()
+
+
+def common_dir(gitdir):
+    """Return common git directory (differs from gitdir for worktrees)."""
+    gitdir = Path(gitdir)
+    try:
+        content = (gitdir / 'commondir').read_text().strip()
+    except FileNotFoundError:
+        return gitdir
+
+    commondir = Path(content)
+    if not commondir.is_absolute():
+        commondir = gitdir / commondir
+
+    return commondir.resolve()
+
+
+# ================================= Refs =====================================
+
+
+def _ref_dir(refname, gitdir, commondir):
+    """Folder where loose ref refname is stored."""
+    if refname.startswith(PER_WORKTREE_REFS):
+        return gitdir
+    else:
+        return commondir
+
+
+def read_packed_refs(commondir):
+    """Parse packed-refs file of common git directory.
+
+    OUTPUT
+    ------
+    (refs, peeled, traits):
+    - refs: dict {refname: hash}
+    - peeled: dict {refname: hash of commit} for annotated tags whose peeled
+      value is recorded (lines starting with ^ following the ref)
+    - traits: set of traits from header (e.g. 'peeled', 'fully-peeled')
+
+    All are empty if there is no packed-refs file.
+    """
+    refs = {}
+    peeled = {}
+    traits = set()
+    refname = None
+
+    try:
+        with open(Path(commondir) / 'packed-refs', 'r') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if line.startswith('#'):
+                    if line.startswith('# pack-refs with:'):
+                        traits.update(line.split(':', 1)[1].split())
+                elif line.startswith('^'):
+                    peeled[refname] = line[1:]
+                else:
+                    sha, _, refname = line.partition(' ')
+                    refs[refname] = sha
+    except FileNotFoundError:
+        pass
+
+    return refs, peeled, traits
+
+
+def packed_refs(commondir):
+    """Return dict {refname: hash} from packed-refs file (empty if no file)."""
+    refs, _, _ = read_packed_refs(commondir)
+    return refs
+
+
+def read_ref(refname, gitdir, commondir=None):
+    """Return commit hash (str) that refname points to, following symrefs.
+
+    INPUTS
+    ------
+    - refname: e.g. 'HEAD', 'refs/heads/main'
+    - gitdir: git directory (e.g. .git folder of repo, or of worktree)
+    - commondir: common git directory, if None, determined from gitdir
+
+    OUTPUT
+    ------
+    str of the hash.
+
+    Raises ValueError if the ref does not exist (e.g. branch without commits)
+    """
+    gitdir = Path(gitdir)
+    commondir = common_dir(gitdir) if commondir is None else Path(commondir)
+
+    packed = None
+
+    for _ in range(MAX_SYMREF_DEPTH):
+
+        loose = _ref_dir(refname, gitdir, commondir) / refname
+        try:
+            content = loose.read_text().strip()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            if packed is None:
+                packed = packed_refs(commondir)
+            try:
+                return packed[refname]
+            except KeyError:
+                raise ValueError(f'Reference {refname} does not exist')
+
+        if content.startswith('ref:'):
+            refname = content[len('ref:'):].strip()
+        else:
+            return content
+
+    raise ValueError(f'Too many levels of symbolic refs for {refname}')
+
+
+def head_ref(gitdir):
+    """Name of the branch HEAD points to (e.g. 'refs/heads/main').
+
+    Returns None if HEAD is detached.
+    """
+    content = (Path(gitdir) / 'HEAD').read_text().strip()
+    if content.startswith('ref:'):
+        return content[len('ref:'):].strip()
+    else:
+        return None
+
+
+def head_commit_hash(dotgit):
+    """Return HEAD commit hash of repo from its .git entry (folder or file)."""
+    gitdir = git_dir(dotgit)
+    return read_ref('HEAD', gitdir, common_dir(gitdir))
+
+
+# ================================= Tags =====================================
+
+
+def _loose_refs(commondir, prefix='refs/tags/'):
+    """Return dict {refname: content} of loose refs starting with prefix."""
+    refs = {}
+    root = Path(commondir) / prefix
+    for folder, _, files in os.walk(root):
+        for file in files:
+            if file.endswith('.lock'):  # ref being written by git
+                continue
+            path = Path(folder) / file
+            refname = prefix + path.relative_to(root).as_posix()
+            try:
+                refs[refname] = path.read_text().strip()
+            except OSError:  # e.g. ref deleted in the meantime
+                pass
+    return refs
+
+
+def peel(sha, commondir, read_object=None):
+    """Hash of commit that object sha points to (following tag objects).
+
+    Loose objects are read directly; for packed objects, read_object (a
+    function taking a hash and returning (type, data) of the object, e.g.
+    using the gitpython object database) is called.
+    """
+    for _ in range(MAX_SYMREF_DEPTH):
+
+        obj = read_loose_object(commondir, sha, size=128)
+
+        if obj is None:
+            if read_object is None:
+                raise ValueError(f'Object {sha} not found in loose objects')
+            obj = read_object(sha)
+
+        obj_type, data = obj
+        if obj_type != 'tag':
+            return sha
+
+        sha, target_type = tag_target(data)
+        if target_type != 'tag':  # no need to read the target object
+            return sha
+
+    raise ValueError(f'Too many levels of tags for {sha}')
+
+
+def _tag_refs(commondir, read_object=None):
+    """Return dict {refname: (object hash, commit hash)} of tags, see tags().
+
+    The object hash differs from the commit hash for annotated tags.
+    """
+    commondir = Path(commondir)
+    packed, peeled, traits = read_packed_refs(commondir)
+
+    # if these traits are present, tags without peeled line are not annotated
+    fully_peeled = bool({'peeled', 'fully-peeled'} & traits)
+
+    refs = {}
+    to_peel = {}
+
+    for refname, sha in packed.items():
+        if not refname.startswith('refs/tags/'):
+            continue
+        if refname in peeled:
+            refs[refname] = sha, peeled[refname]
+        elif fully_peeled:
+            refs[refname] = sha, sha
+        else:
+            to_peel[refname] = sha
+
+    for refname, content in _loose_refs(commondir).items():
+        refs.pop(refname, None)
+        if content.startswith('ref:'):
+            gitdir = commondir  # symbolic tag refs are very unusual
+            to_peel[refname] = read_ref(refname, gitdir, commondir)
+        else:
+            to_peel[refname] = content
+
+    for refname, sha in to_peel.items():
+        refs[refname] = sha, peel(sha, commondir, read_object)
+
+    return refs
+
+
+def tags(commondir, read_object=None):
+    """Return dict {tag name: commit hash} of all tags in repo.
+
+    Tags are read from packed-refs (using peeled lines for annotated tags)
+    and from loose refs in refs/tags (which take precedence). Objects are
+    only read for annotated tags whose peeled value is not known, see peel().
+
+    INPUTS
+    ------
+    - commondir: common git directory
+    - read_object: function hash -> (type, data) for packed objects (peel())
+
+    OUTPUT
+    ------
+    dict {tag name (e.g. 'v1.0'): commit hash}, sorted by tag name.
+    """
+    refs = _tag_refs(commondir, read_object=read_object)
+    return {refname[len('refs/tags/'):]: refs[refname][1]
+            for refname in sorted(refs)}
+
+
+def _tagger_time(data):
+    """Tagger time (int, 0 if absent) from tag object data."""
+    for line in data.split(b'\n'):
+        if not line:  # end of headers, start of message
+            break
+        if line.startswith(b'tagger '):
+            try:
+                return int(line.rsplit(b' ', 2)[1])
+            except (IndexError, ValueError):
+                return 0
+    return 0
+
+
+def tags_fingerprint(commondir):
+    """Stat signature of packed-refs and of folders containing loose tags.
+
+    Creating, deleting or moving a loose tag changes the mtime of the
+    folder containing it (git writes refs with a lock file and a rename).
+    Only folders are stat'ed (their list is cached, see _tag_folders()), so
+    that the cost does not depend on the number of loose tags.
+    """
+    commondir = Path(commondir)
+    packed_refs = _stat_signature(commondir / 'packed-refs')
+    return (packed_refs,) + _tag_folders(commondir)
+
+
+def _stat_signature(path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return str(path), st.st_ino, st.st_mtime_ns, st.st_size
+
+
+_tag_folders_cache = {}  # {refs/tags folder: (folders, signatures)}
+_tag_folders_lock = threading.Lock()
+
+
+def _tag_folders(commondir):
+    """Stat signatures of refs/tags and its subfolders.
+
+    The list of folders is cached; folders are listed again only if the
+    signature of one of them has changed (a folder created or deleted in
+    refs/tags changes the mtime of its parent folder).
+    """
+    root = Path(commondir) / 'refs' / 'tags'
+
+    with _tag_folders_lock:
+        cached = _tag_folders_cache.get(root)
+
+    if cached is not None:
+        folders, signatures = cached
+        if tuple(_stat_signature(folder) for folder in folders) == signatures:
+            return signatures
+
+    # Each folder is stat'ed before being listed, so that changes made
+    # while walking are seen at next call.
+    folders = []
+    signatures = []
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        folders.append(folder)
+        signatures.append(_stat_signature(folder))
+        try:
+            with os.scandir(folder) as entries:
+                stack.extend(Path(entry.path) for entry in entries
+                             if entry.is_dir(follow_symlinks=False))
+        except OSError:  # e.g. no refs/tags folder
+            pass
+
+    signatures = tuple(signatures)
+
+    with _tag_folders_lock:
+        _tag_folders_cache[root] = folders, signatures
+
+    return signatures
+
+
+def clear_tag_folders_cache():
+    """Forget cached lists of tag folders."""
+    with _tag_folders_lock:
+        _tag_folders_cache.clear()
+
+
+class TagIndex:
+    """Reverse index {commit hash: tags} of all tags in a repository.
+
+    Built once from packed-refs and loose refs (see tags()); tags_for()
+    is then a dict lookup. The fingerprint attribute (tags_fingerprint())
+    allows to check if the index is still valid.
+    """
+
+    def __init__(self, commondir, read_object=None):
+        self.commondir = Path(commondir)
+        self.fingerprint = tags_fingerprint(commondir)
+        refs = _tag_refs(commondir, read_object=read_object)
+        self.tags = {}
+        self._objects = {}  # {tag name: tag object hash} for annotated tags
+        for refname in sorted(refs):
+            tag = refname[len('refs/tags/'):]
+            obj, commit = refs[refname]
+            self.tags[tag] = commit
+            if obj != commit:
+                self._objects[tag] = obj
+        self._commits = {}  # {commit hash: [tag names]}
+        for tag, commit in self.tags.items():
+            self._commits.setdefault(commit, []).append(tag)
+
+    def tags_for(self, commit):
+        """Tuple of all tag names (sorted) pointing at commit (hash str)."""
+        return tuple(self._commits.get(commit, ()))
+
+    def is_annotated(self, tag):
+        """True if tag (name) is an annotated tag."""
+        return tag in self._objects
+
+    def describe_name(self, commit, read_object=None):
+        """Tag of commit used by git describe --tags, None if not tagged.
+
+        As in git, annotated tags are preferred over lightweight tags; among
+        several annotated tags, the one with the most recent tagger date is
+        used (tag objects are read, see peel() for read_object); remaining
+        ties go to the first tag name in alphabetical order.
+        """
+        names = self.tags_for(commit)
+        annotated = [name for name in names if name in self._objects]
+        if len(annotated) < 2:
+            return annotated[0] if annotated else (names[0] if names else None)
+        best, best_time = None, None
+        for name in annotated:
+            time = self._tagger_time(name, read_object)
+            if best is None or best_time < time:
+                best, best_time = name, time
+        return best
+
+    def _tagger_time(self, tag, read_object=None):
+        sha = self._objects[tag]
+        obj = read_loose_object(self.commondir, sha)
+        if obj is None and read_object is not None:
+            try:
+                obj = read_object(sha)
+            except (ValueError, OSError):
+                obj = None
+        return 0 if obj is None else _tagger_time(obj[1])
+
+    def is_valid(self, commondir):
+        """True if tags in commondir have not changed since index built."""
+        return tags_fingerprint(commondir) == self.fingerprint
+
+    def __len__(self):
+        return len(self.tags)
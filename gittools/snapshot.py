@@ -0,0 +1,164 @@
+"""Status snapshots passed from a parent process to its children.
+
+A snapshot of module_status() results is stored (as JSON) in the
+GITTOOLS_STATUS environment variable, which is inherited by subprocesses
+(multiprocessing, subprocess, srun etc.). If the snapshot is large, it is
+written to a file and the variable contains '@' followed by the file path.
+
+Each module entry records the module file, the module_status() options
+it was computed with and a fingerprint of its repository (HEAD, refs,
+packed-refs, index, see diskcache.fingerprint()); module_status() uses the
+entry only if all still match, which requires a few stat calls and no git
+call. Note that, as for the on-disk cache, changes in the working tree made
+after the export are not detected.
+
+The snapshot is only used by child processes: the exporting process itself
+keeps computing the status of modules. Temporary files created for large
+snapshots are removed when the exporting process exits.
+"""
+
+from pathlib import Path
+import atexit
+import json
+import os
+import tempfile
+
+from .discovery import find_dotgit
+from .refs import git_dir, common_dir
+from .diskcache import fingerprint
+
+
+ENV_VAR = 'GITTOOLS_STATUS'
+MAX_ENV_SIZE = 32768  # above that size, the snapshot is written to a file
+
+_parsed = {}  # {raw env variable value: parsed snapshot}
+_exported = {}  # {env variable value: pid of process that exported it}
+_tempfiles = []  # [(path, pid)] of temporary snapshot files created
+
+
+def repo_fingerprint(path):
+    """Fingerprint of repo containing path (None if not in a git repo)."""
+    dotgit = find_dotgit(path, missing_ok=True)
+    if dotgit is None:
+        return None
+    try:
+        gitdir = git_dir(dotgit)
+    except (OSError, ValueError):  # broken .git file
+        return None
+    return fingerprint(gitdir, common_dir(gitdir))
+
+
+def module_entry(module, info, scope, nogit_ok, checktree):
+    """Snapshot entry for module with its module_status() info and options."""
+    file = str(Path(module.__file__).resolve())
+    return {'file': file,
+            'scope': scope,
+            'nogit_ok': nogit_ok,
+            'checktree': checktree,
+            'fingerprint': repo_fingerprint(file),
+            'info': info}
+
+
+def dump(entries, file=None, env=True):
+    """Serialize snapshot {module name: entry} and store it.
+
+    INPUTS
+    ------
+    - entries: dict {module name: entry}, see module_entry()
+    - file: if not None, the snapshot is written to this file, and the
+      environment variable points to it; if None, a temporary file is
+      used only if the snapshot is too large for an environment variable
+      (removed at exit of the current process).
+    - env: if True, set the GITTOOLS_STATUS environment variable (for child
+      processes, it is ignored by the current process).
+
+    OUTPUT
+    ------
+    str, value of the environment variable (JSON, or '@' + file path).
+    """
+    text = json.dumps(entries, separators=(',', ':'), ensure_ascii=False)
+
+    if file is None and len(text) > MAX_ENV_SIZE:
+        fd, file = tempfile.mkstemp(prefix='gittools-status-',
+                                    suffix='.json')
+        os.close(fd)
+        _tempfiles.append((file, os.getpid()))
+
+    if file is not None:
+        Path(file).write_text(text, encoding='utf8')
+        value = '@' + str(Path(file).resolve())
+    else:
+        value = text
+
+    if env:
+        os.environ[ENV_VAR] = value
+        _exported[value] = os.getpid()
+
+    return value
+
+
+def _remove_tempfiles():
+    """Remove temporary snapshot files created by the current process."""
+    pid = os.getpid()  # forked children must not remove them
+    for file, creator in _tempfiles:
+        if creator == pid:
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+
+
+atexit.register(_remove_tempfiles)
+
+
+def _load():
+    """Parsed snapshot from environment variable (empty dict if none)."""
+    value = os.environ.get(ENV_VAR)
+    if not value or _exported.get(value) == os.getpid():
+        return {}
+
+    try:
+        return _parsed[value]
+    except KeyError:
+        pass
+
+    try:
+        if value.startswith('@'):
+            text = Path(value[1:]).read_text(encoding='utf8')
+        else:
+            text = value
+        entries = json.loads(text)
+    except (OSError, ValueError):
+        entries = {}
+
+    _parsed.clear()
+    _parsed[value] = entries
+    return entries
+
+
+def lookup(module, scope, nogit_ok, checktree):
+    """Return info of module from snapshot if still valid, else None.
+
+    The entry is used only if it was computed with the same options.
+    """
+    entries = _load()
+    if not entries:
+        return None
+
+    try:
+        entry = entries[module.__name__]
+    except KeyError:
+        return None
+
+    file = str(Path(module.__file__).resolve())
+
+    options = scope, nogit_ok, checktree
+    if entry['file'] != file or options != (entry.get('scope'),
+                                            entry.get('nogit_ok'),
+                                            entry.get('checktree')):
+        return None
+
+    if entry['fingerprint'] != repo_fingerprint(file):
+        return None
+
+    return entry['info']
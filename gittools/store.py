@@ -0,0 +1,329 @@
+"""Provenance store: metadata of many runs in one indexed SQLite database.
+
+Tables
+------
+- runs: one row per save_metadata() record (time, source file if migrated
+  from JSON, and other info as JSON)
+- modules: names of modules / packages
+- code_versions: status of a module in a run (hash, status, tag, describe,
+  full info as JSON)
+
+Indexes on time, hash, tag and module make queries such as "which runs used
+gittools at commit X while dirty" fast even with many runs. The database
+uses WAL mode, so that many processes can write to it concurrently (each
+write is a short transaction) while others read it.
+
+Existing JSON / JSON Lines files written by save_metadata() can be ingested
+in bulk with ProvenanceStore.ingest(), or from the command line:
+
+    python -m gittools.store provenance.sqlite metadata/*.json
+"""
+
+from pathlib import Path
+import argparse
+import json
+import sqlite3
+import threading
+
+from .writers import default
+
+
+SUFFIXES = '.sqlite', '.sqlite3', '.db'  # save_metadata() targets a store
+
+TIME = 'time (utc)'
+CODE = 'code version'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    time TEXT,
+    source TEXT,
+    info TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS modules (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS code_versions (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    module_id INTEGER NOT NULL REFERENCES modules(id),
+    hash TEXT,
+    status TEXT,
+    tag TEXT,
+    describe TEXT,
+    info TEXT NOT NULL,
+    PRIMARY KEY (run_id, module_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_time ON runs(time);
+CREATE INDEX IF NOT EXISTS code_versions_hash ON code_versions(hash);
+CREATE INDEX IF NOT EXISTS code_versions_tag ON code_versions(tag);
+CREATE INDEX IF NOT EXISTS code_versions_module
+    ON code_versions(module_id, hash);
+"""
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False,
+                      default=default)
+
+
+def is_store(file):
+    """True if file is a ProvenanceStore or the path of an SQLite file."""
+    if isinstance(file, ProvenanceStore):
+        return True
+    return Path(file).suffix.lower() in SUFFIXES
+
+
+class ProvenanceStore:
+    """SQLite database of metadata records (see save_metadata()).
+
+    Parameters
+    ----------
+    - path: str or path object of database file (created if needed)
+    - timeout: time (s) to wait for locks held by other writers
+
+    Can be used as a context manager (closed at exit), and shared between
+    threads (e.g. with MetadataWriter).
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(str(path), timeout=timeout,
+                                          check_same_thread=False)
+        self._lock = threading.Lock()
+        self._module_ids = {}  # {module name: id}
+        with self._lock, self.connection as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA foreign_keys=ON')
+            connection.executescript(SCHEMA)
+
+    # ------------------------------------------------------------------------
+    # Writing
+
+    def _module_id(self, cursor, name):
+        try:
+            return self._module_ids[name]
+        except KeyError:
+            pass
+        cursor.execute('INSERT OR IGNORE INTO modules (name) VALUES (?)',
+                       (name,))
+        cursor.execute('SELECT id FROM modules WHERE name = ?', (name,))
+        module_id = self._module_ids[name] = cursor.fetchone()[0]
+        return module_id
+
+    def _insert(self, cursor, metadata, source):
+        info = {key: value for key, value in metadata.items()
+                if key not in (TIME, CODE)}
+        cursor.execute('INSERT INTO runs (time, source, info) '
+                       'VALUES (?, ?, ?)',
+                       (metadata.get(TIME), source, _dumps(info)))
+        run_id = cursor.lastrowid
+
+        rows = []
+        for module, status in (metadata.get(CODE) or {}).items():
+            rows.append((run_id, self._module_id(cursor, module),
+                         status.get('hash'), status.get('status'),
+                         status.get('tag'), status.get('describe'),
+                         _dumps(status)))
+
+        cursor.executemany('INSERT INTO code_versions VALUES '
+                           '(?, ?, ?, ?, ?, ?, ?)', rows)
+        return run_id
+
+    def add(self, metadata, source=None):
+        """Add one metadata record (dict, see save_metadata()); returns id."""
+        return self.add_many([metadata], source=source)[0]
+
+    def add_many(self, records, source=None):
+        """Add many metadata records in a single transaction; returns ids.
+
+        records: iterable of metadata dicts, or of (metadata, source) tuples
+        if source is None (source: e.g. name of file the record comes from).
+        """
+        ids = []
+        with self._lock, self.connection as connection:
+            cursor = connection.cursor()
+            try:
+                for record in records:
+                    if source is None and isinstance(record, tuple):
+                        metadata, record_source = record
+                    else:
+                        metadata, record_source = record, source
+                    ids.append(self._insert(cursor, metadata, record_source))
+            except BaseException:
+                self._module_ids.clear()  # ids of rolled back modules
+                raise
+        return ids
+
+    def ingest(self, files):
+        """Add records of JSON / JSON Lines files written by save_metadata().
+
+        All records are inserted in a single transaction. Files that cannot
+        be read or parsed are skipped.
+
+        Parameters
+        ----------
+        - files: iterable of str or path objects
+
+        Output
+        ------
+        (number of records added, list of files skipped)
+        """
+        records = []
+        skipped = []
+
+        for file in files:
+            try:
+                text = Path(file).read_text(encoding='utf8')
+                try:
+                    data = [json.loads(text)]
+                except ValueError:  # JSON Lines, one record per line
+                    data = [json.loads(line) for line in text.splitlines()
+                            if line.strip()]
+            except (OSError, ValueError):
+                skipped.append(file)
+                continue
+            if not all(isinstance(metadata, dict) for metadata in data):
+                skipped.append(file)
+                continue
+            records.extend((metadata, str(file)) for metadata in data)
+
+        self.add_many(records)
+        return len(records), skipped
+
+    # ------------------------------------------------------------------------
+    # Queries
+
+    def find(self, module=None, hash=None, tag=None, status=None,
+             start=None, end=None):
+        """Metadata records (sorted by time) matching all given criteria.
+
+        Parameters
+        ----------
+        - module: name of module in code version of run (e.g. 'gittools');
+          hash, tag and status then refer to this module, else to any module.
+        - hash: commit hash, or beginning of it
+        - tag: tag at commit
+        - status: e.g. 'clean', 'dirty', 'not a git repository'
+        - start, end: str of time (UTC) 'YYYY-MM-DD[ HH:MM:SS]'; runs from
+          start (inclusive) to end (exclusive)
+
+        Output
+        ------
+        list of metadata dicts, as saved by save_metadata()
+
+        Example
+        -------
+        store.find(module='gittools', hash='4c31677', status='dirty')
+        """
+        conditions = []  # on code versions
+        parameters = []
+
+        if module is not None:
+            conditions.append('m.name = ?')
+            parameters.append(module)
+        if hash is not None:
+            if len(hash) < 40:  # prefix, range query to use index
+                conditions.append('cv.hash >= ? AND cv.hash < ?')
+                parameters.extend((hash, hash + '~'))
+            else:
+                conditions.append('cv.hash = ?')
+                parameters.append(hash)
+        if tag is not None:
+            conditions.append('cv.tag = ?')
+            parameters.append(tag)
+        if status is not None:
+            conditions.append('cv.status = ?')
+            parameters.append(status)
+
+        run_conditions = []
+        if conditions:
+            run_conditions.append(
+                'id IN (SELECT cv.run_id FROM code_versions cv '
+                'JOIN modules m ON m.id = cv.module_id '
+                'WHERE ' + ' AND '.join(conditions) + ')')
+        if start is not None:
+            run_conditions.append('time >= ?')
+            parameters.append(start)
+        if end is not None:
+            run_conditions.append('time < ?')
+            parameters.append(end)
+
+        where = ''
+        if run_conditions:
+            where = ' WHERE ' + ' AND '.join(run_conditions)
+
+        with self._lock:
+            runs = self.connection.execute(
+                f'SELECT id, time, info FROM runs{where} ORDER BY time, id',
+                parameters).fetchall()
+            versions = self.connection.execute(
+                'SELECT cv.run_id, m.name, cv.info FROM code_versions cv '
+                'JOIN modules m ON m.id = cv.module_id '
+                f'WHERE cv.run_id IN (SELECT id FROM runs{where})',
+                parameters).fetchall()
+
+        code_versions = {}  # {run id: {module name: status}}
+        for run_id, name, status in versions:
+            code_versions.setdefault(run_id, {})[name] = json.loads(status)
+
+        records = []
+        for run_id, time, info in runs:
+            metadata = json.loads(info)
+            metadata[TIME] = time
+            if run_id in code_versions:
+                metadata[CODE] = code_versions[run_id]
+            records.append(metadata)
+
+        return records
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    # ------------------------------------------------------------------------
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def save(file, metadata):
+    """Add metadata to store (ProvenanceStore, or path of database file)."""
+    if isinstance(file, ProvenanceStore):
+        return file.add(metadata)
+    with ProvenanceStore(file) as store:
+        return store.add(metadata)
+
+
+# ============================= Migration tool ===============================
+
+
+def main(args=None):
+    """Command line tool ingesting JSON metadata files in a store."""
+    parser = argparse.ArgumentParser(
+        prog='python -m gittools.store',
+        description='Ingest JSON / JSON Lines files written by '
+                    'save_metadata() into an SQLite provenance store.')
+    parser.add_argument('database', help='SQLite file (created if needed)')
+    parser.add_argument('files', nargs='+', help='JSON / JSONL files')
+    args = parser.parse_args(args)
+
+    with ProvenanceStore(args.database) as store:
+        n, skipped = store.ingest(args.files)
+
+    print(f'{n} records added to {args.database}')
+    for file in skipped:
+        print(f'Skipped (not readable as JSON): {file}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Writing of metadata records to files (JSON, or JSON Lines in append mode).
+
+In append mode, each record is written as one compact JSON line, in a single
+write() on a file descriptor opened with O_APPEND, while holding an advisory
+lock (flock) on the file: many processes can thus log to the same file at
+high frequency without rewriting it and without interleaving lines.
+
+Records are converted to bytes by serializers, chosen by name (see
+SERIALIZERS) or given as Serializer instances:
+- 'json' (default): pretty-printed JSON (compact JSON lines in append mode)
+- 'compact-json': compact JSON, smaller and faster to write
+- 'orjson': compact JSON with the orjson package (much faster)
+- 'fast': 'orjson' if installed, else 'compact-json'
+- 'msgpack': MessagePack (binary); in append mode, records are simply
+  concatenated and can be read back with msgpack.Unpacker.
+All of them convert NumPy scalars and arrays, paths, datetimes and sets
+with default() below.
+"""
+
+from pathlib import PurePath
+import datetime
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: O_APPEND only, no advisory lock
+    fcntl = None
+
+
+MODES = 'write', 'append'
+
+
+# ============================= Default handler ==============================
+
+
+def default(obj):
+    """Convert objects not supported natively by serializers.
+
+    NumPy arrays and scalars (and other objects with a tolist() method, e.g.
+    from other array libraries) are converted to (lists of) python numbers,
+    paths to str, datetimes / dates / times to ISO format and sets to lists.
+    """
+    if isinstance(obj, PurePath):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):  # numpy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} '
+                    'is not serializable')
+
+
+# =============================== Serializers ================================
+
+
+class Serializer:
+    """Conversion of metadata to bytes, for files and for append logs.
+
+    Subclasses define dumps() (whole file, mode='write') and may redefine
+    dumps_record() (one record of an append-only log, mode='append'), which
+    must be self-delimiting (e.g. one line for JSON Lines).
+    """
+
+    def dumps(self, data):
+        raise NotImplementedError
+
+    def dumps_record(self, data):
+        return self.dumps(data)
+
+
+class JsonSerializer(Serializer):
+    """JSON with the json module of the standard library.
+
+    If indent is None, the output is compact; records are always compact.
+    """
+
+    def __init__(self, indent=None):
+        self.indent = indent
+
+    def _dumps(self, data, indent):
+        # Note: the ensure_ascii option is for signs like °
+        separators = (',', ':') if indent is None else None
+        text = json.dumps(data, indent=indent, separators=separators,
+                          ensure_ascii=False, default=default)
+        return text.encode('utf8')
+
+    def dumps(self, data):
+        return self._dumps(data, self.indent)
+
+    def dumps_record(self, data):
+        return self._dumps(data, None) + b'\n'
+
+
+class OrjsonSerializer(Serializer):
+    """Compact JSON with orjson (NumPy arrays serialized natively)."""
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, data):
+        return self._orjson.dumps(data, default=default, option=self._options)
+
+    def dumps_record(self, data):
+        return self.dumps(data) + b'\n'
+
+
+class MsgpackSerializer(Serializer):
+    """MessagePack with msgpack (records are self-delimiting)."""
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def dumps(self, data):
+        return self._msgpack.packb(data, default=default, use_bin_type=True)
+
+
+def _fast_serializer():
+    try:
+        return OrjsonSerializer()
+    except ImportError:
+        return JsonSerializer()
+
+
+# {name: function returning serializer}, functions so that optional
+# dependencies (orjson, msgpack) are only imported when used
+SERIALIZERS = {'json': lambda: JsonSerializer(indent=4),
+               'compact-json': JsonSerializer,
+               'orjson': OrjsonSerializer,
+               'fast': _fast_serializer,
+               'msgpack': MsgpackSerializer}
+
+_serializers = {}  # {name: serializer instance}
+
+
+def get_serializer(serializer='json'):
+    """Serializer instance from its name (or instance, returned as is).
+
+    Raises ValueError if name is unknown, ImportError if the package needed
+    by the serializer (orjson, msgpack) is not installed.
+    """
+    if isinstance(serializer, Serializer):
+        return serializer
+    try:
+        return _serializers[serializer]
+    except KeyError:
+        pass
+    try:
+        factory = SERIALIZERS[serializer]
+    except KeyError:
+        raise ValueError(f'serializer must be in {tuple(SERIALIZERS)} or '
+                         f'a Serializer instance, not {serializer!r}')
+    instance = _serializers[serializer] = factory()
+    return instance
+
+
+# ================================ Writing ===================================
+
+
+def write_bytes(file, data):
+    """Write data (bytes) into file, replacing its contents."""
+    with open(file, 'wb') as f:
+        f.write(data)
+
+
+def append_bytes(file, data):
+    """Append data (bytes) to file, atomically with respect to other writers.
+
+    The file is created if it does not exist. The data is written with a
+    single write (repeated only if the OS writes it partially) under an
+    exclusive advisory lock, so that concurrent writers do not corrupt it.
+    """
+    buffer = memoryview(data)
+
+    fd = os.open(file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        while buffer:
+            buffer = buffer[os.write(fd, buffer):]
+    finally:
+        os.close(fd)  # also releases the lock
+
+
+def write_json(file, data):
+    """Write data into a (pretty-printed) JSON file, replacing its contents."""
+    write_bytes(file, get_serializer('json').dumps(data))
+
+
+def append_jsonl(file, data):
+    """Append data as one compact JSON line to a JSON Lines file."""
+    append_bytes(file, get_serializer('json').dumps_record(data))
+
+
+def save(file, data, mode='write', serializer='json'):
+    """Save data in file, mode 'write' (whole file) or 'append' (record).
+
+    serializer: name or Serializer instance, see get_serializer().
+    """
+    serializer = get_serializer(serializer)
+    if mode == 'write':
+        write_bytes(file, serializer.dumps(data))
+    elif mode == 'append':
+        append_bytes(file, serializer.dumps_record(data))
+    else:
+        raise ValueError(f"mode must be in {MODES}, not {mode!r}")
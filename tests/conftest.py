@@ -0,0 +1,35 @@
+"""Fixtures for gittools tests (temporary git repositories)."""
+
+
+import os
+import subprocess
+
+import pytest
+
+
+GIT_ENV = {'GIT_AUTHOR_NAME': 'test',
+           'GIT_AUTHOR_EMAIL': 'test@example.com',
+           'GIT_COMMITTER_NAME': 'test',
+           'GIT_COMMITTER_EMAIL': 'test@example.com',
+           'GIT_CONFIG_NOSYSTEM': '1'}
+
+
+def git(repo, *args):
+    """Run git command in repo folder and return its stripped output."""
+    env = {**os.environ, **GIT_ENV}
+    out = subprocess.run(('git', '-C', str(repo)) + args, env=env, check=True,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return out.stdout.decode().strip()
+
+
+@pytest.fixture
+def tmp_repo(tmp_path):
+    """Git repository with one commit containing a.txt and pkg/b.txt."""
+    repo = tmp_path / 'repo'
+    (repo / 'pkg').mkdir(parents=True)
+    (repo / 'a.txt').write_text('a\n')
+    (repo / 'pkg' / 'b.txt').write_text('b\n')
+    git(repo, 'init', '-q')
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-q', '-m', 'first')
+    return repo
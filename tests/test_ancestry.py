@@ -0,0 +1,143 @@
+"""Tests for ancestry walk and nearest-tag computation in gittools (pytest)."""
+
+
+import os
+import random
+import subprocess
+
+import pytest
+
+from gittools.ancestry import Describer, CommitGraph, MAX_COMMITS
+from gittools.refs import TagIndex
+
+from conftest import git, GIT_ENV
+
+
+@pytest.fixture
+def history(tmp_repo):
+    """Repo with a tag, a merge, and commits after the tag."""
+    git(tmp_repo, 'tag', 'v1.0')
+    git(tmp_repo, 'checkout', '-q', '-b', 'feature')
+    (tmp_repo / 'pkg' / 'b.txt').write_text('feature\n')
+    git(tmp_repo, 'commit', '-q', '-am', 'feature')
+    git(tmp_repo, 'checkout', '-q', '-')
+    (tmp_repo / 'a.txt').write_text('main\n')
+    git(tmp_repo, 'commit', '-q', '-am', 'main')
+    git(tmp_repo, 'merge', '-q', '--no-edit', 'feature')
+    return tmp_repo
+
+
+@pytest.mark.parametrize('commit_graph', [False, True])
+def test_describe(history, commit_graph):
+    """Same result as git describe, with or without commit-graph."""
+    if commit_graph:
+        git(history, 'commit-graph', 'write', '--reachable')
+    commondir = history / '.git'
+    describer = Describer(commondir)
+    assert (describer.graph is not None) == commit_graph
+    sha = git(history, 'rev-parse', 'HEAD')
+    expected = git(history, 'describe', '--tags')
+    tag_index = TagIndex(commondir)
+    assert describer.describe(sha, tag_index) == expected
+    assert (sha, tag_index.fingerprint, MAX_COMMITS) in describer._results
+    assert describer.describe(sha, tag_index, max_commits=1) is None
+    assert describer.describe(sha, tag_index) == expected
+
+
+def _git_at(repo, date, *args):
+    """Run git command in repo with author and committer dates set."""
+    env = {**os.environ, **GIT_ENV, 'GIT_AUTHOR_DATE': date,
+           'GIT_COMMITTER_DATE': date}
+    out = subprocess.run(('git', '-C', str(repo)) + args, env=env, check=True,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return out.stdout.decode().strip()
+
+
+def _random_history(repo, seed, n=30):
+    """Random merge history (commit times increasing), with tags of all
+    kinds (lightweight, annotated, several per commit). Returns commits."""
+    rng = random.Random(seed)
+    git(repo, 'init', '-q')
+    tree = git(repo, 'mktree')
+    commits = []
+    for i in range(n):
+        nparents = min(rng.choice([1, 1, 2, 3]), len(commits))
+        date = f'{1600000000 + 60 * i} +0000'
+        args = ['commit-tree', tree, '-m', str(i)]
+        for parent in rng.sample(commits[-6:], nparents):
+            args += ['-p', parent]
+        commits.append(_git_at(repo, date, *args))
+        draw = rng.random()
+        if draw < 0.3:
+            git(repo, 'tag', f'l{i}', commits[-1])
+        if 0.2 < draw < 0.4:
+            _git_at(repo, date, 'tag', '-a', '-m', 'annotated', f'a{i}',
+                    commits[-1])
+    return commits
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_describe_merges(tmp_path, seed):
+    """Same result as git describe on random merge histories."""
+    commits = _random_history(tmp_path, seed)
+    commondir = tmp_path / '.git'
+    describer = Describer(commondir)
+    tag_index = TagIndex(commondir)
+    for sha in commits:
+        try:
+            expected = git(tmp_path, 'describe', '--tags', sha)
+        except subprocess.CalledProcessError:  # no tag in history
+            expected = None
+        assert describer.describe(sha, tag_index) == expected
+
+
+def test_describe_name(tmp_repo):
+    """Annotated tags preferred, then most recent one, as in git describe."""
+    for tag in 'l1', 'l2':
+        git(tmp_repo, 'tag', tag)
+    tag_index = TagIndex(tmp_repo / '.git')
+    assert tag_index.describe_name(git(tmp_repo, 'rev-parse', 'HEAD')) == 'l1'
+    for tag, date in ('a2', '1600000000 +0000'), ('a1', '1500000000 +0000'):
+        _git_at(tmp_repo, date, 'tag', '-a', '-m', tag, tag)
+    sha = git(tmp_repo, 'rev-parse', 'HEAD')
+    tag_index = TagIndex(tmp_repo / '.git')
+    assert tag_index.is_annotated('a1') and not tag_index.is_annotated('l1')
+    assert tag_index.describe_name(sha) == 'a2'
+    assert Describer(tmp_repo / '.git').describe(sha, tag_index) == \
+        git(tmp_repo, 'describe', '--tags') == 'a2'
+
+
+def test_describe_pruning(tmp_path):
+    """Walk stops early if no tag exists or can be reached (commit-graph)."""
+    git(tmp_path, 'init', '-q')
+    tree = git(tmp_path, 'mktree')
+    commits = [git(tmp_path, 'commit-tree', tree, '-m', '0')]
+    for i in range(1, 50):
+        commits.append(git(tmp_path, 'commit-tree', tree, '-m', str(i),
+                           '-p', commits[-1]))
+    git(tmp_path, 'update-ref', 'refs/heads/main', commits[-1])
+    git(tmp_path, 'commit-graph', 'write', '--reachable')
+    commondir = tmp_path / '.git'
+
+    describer = Describer(commondir)
+    assert describer.describe(commits[-1], TagIndex(commondir)) is None
+    assert len(describer._commits) == 0  # no tags: no walk
+
+    side = git(tmp_path, 'commit-tree', tree, '-m', 'side', '-p', commits[40])
+    git(tmp_path, 'tag', 'side', side)  # not in history of last commit
+    git(tmp_path, 'commit-graph', 'write', '--reachable')
+    describer = Describer(commondir)
+    assert describer.describe(commits[-1], TagIndex(commondir)) is None
+    assert len(describer._commits) < 15
+
+
+def test_commit_graph(history):
+    """Parents read from commit-graph are the same as from git."""
+    git(history, 'commit-graph', 'write', '--reachable')
+    graph = CommitGraph.load(history / '.git')
+    sha = git(history, 'rev-parse', 'HEAD')
+    parents, generation, _ = graph.commit(graph.position(sha))
+    assert [graph.sha(p) for p in parents] == \
+        git(history, 'rev-parse', 'HEAD^1', 'HEAD^2').split('\n')
+    assert generation == 3
+    assert graph.position('0' * 40) is None
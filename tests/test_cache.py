@@ -0,0 +1,97 @@
+"""Tests for the Repo handle cache of gittools (pytest)."""
+
+
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+import threading
+
+import gittools
+from gittools.cache import get_repo, tracked_paths, _repo_cache
+
+from conftest import git
+
+
+def test_same_repo(tmp_repo):
+    """Repeated calls on the same repository return the same Repo object."""
+    repo1 = get_repo(tmp_repo / 'a.txt')
+    repo2 = get_repo(tmp_repo / 'pkg' / 'b.txt')
+    assert repo1 is repo2
+
+
+def test_threads(tmp_repo):
+    """Each thread gets its own Repo object; concurrent status calls work."""
+    git(tmp_repo, 'tag', '-a', '-m', 'first', 'v1.0')
+    git(tmp_repo, 'gc', '-q')  # packed objects, read with git cat-file
+    (tmp_repo / 'a.txt').write_text('modified\n')
+    expected = gittools.path_status(tmp_repo / 'a.txt')
+    assert expected['status'] == 'dirty' and expected['tag'] == 'v1.0'
+
+    barrier = threading.Barrier(8)  # all calls in different threads
+
+    def status(_):
+        barrier.wait()
+        for _ in range(20):
+            assert gittools.path_status(tmp_repo / 'a.txt') == expected
+        return get_repo(tmp_repo)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        repos = list(executor.map(status, range(8)))
+
+    ids = {id(repo) for repo in repos}
+    assert len(ids) == 8 and id(get_repo(tmp_repo)) not in ids
+
+
+def test_invalidation(tmp_repo):
+    """Committing renews the cached Repo object and the returned hash."""
+    cch1 = gittools.current_commit_hash(tmp_repo)
+    repo1 = get_repo(tmp_repo)
+    (tmp_repo / 'a.txt').write_text('aa\n')
+    git(tmp_repo, 'commit', '-q', '-am', 'second')
+    cch2 = gittools.current_commit_hash(tmp_repo)
+    assert cch2 != cch1
+    assert cch2 == git(tmp_repo, 'rev-parse', 'HEAD')
+    assert get_repo(tmp_repo) is not repo1
+
+
+def test_clear_cache(tmp_repo):
+    """clear_cache() empties the cache."""
+    get_repo(tmp_repo)
+    gittools.clear_cache()
+    assert len(_repo_cache) == 0
+
+
+def test_tracked_paths(tmp_repo):
+    """Tracked paths of a commit (files and folders), cached per commit."""
+    commit = get_repo(tmp_repo).head.commit
+    paths = tracked_paths(commit)
+    assert paths == {'a.txt', 'pkg', 'pkg/b.txt'}
+    assert tracked_paths(commit) is paths
+    assert gittools.path_in_tree(tmp_repo / 'pkg', commit)
+    (tmp_repo / 'new.txt').write_text('new\n')
+    assert not gittools.path_in_tree(tmp_repo / 'new.txt', commit)
+
+
+def test_dead_threads(tmp_repo, tmp_path):
+    """Handles of exited threads are reclaimed; pool threads are reused."""
+    gittools.clear_cache()
+    thread = threading.Thread(target=get_repo, args=(tmp_repo,))
+    thread.start()
+    thread.join()
+    assert len(_repo_cache) == 1
+    other = tmp_path / 'other'
+    other.mkdir()
+    git(other, 'init', '-q')
+    git(other, 'commit', '-q', '--allow-empty', '-m', 'first')
+    get_repo(other)
+    assert len(_repo_cache) == 1  # only handle of current thread
+
+    modules = []
+    for name, file in ('a', tmp_repo / 'a.txt'), ('b', other):
+        module = ModuleType(name)
+        module.__file__ = str(file)
+        modules.append(module)
+    for _ in range(10):
+        gittools.module_status(modules, max_workers=2)
+    alive = {thread.ident for thread in threading.enumerate()}
+    threads = {thread for _, thread in _repo_cache._repos}
+    assert len(threads) <= 3 and threads <= alive  # 2 workers + current
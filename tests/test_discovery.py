@@ -0,0 +1,51 @@
+"""Tests for repository discovery in gittools (pytest)."""
+
+
+import sysconfig
+from pathlib import Path
+
+import pytest
+from git import InvalidGitRepositoryError
+
+from gittools.discovery import RepoFinder
+
+
+def test_find(tmp_repo):
+    """.git found from subfolders, then from memo."""
+    finder = RepoFinder()
+    dotgit = tmp_repo / '.git'
+    assert finder.find(tmp_repo / 'pkg' / 'b.txt') == dotgit
+    assert finder.find(tmp_repo / 'pkg') == dotgit
+    assert str(tmp_repo / 'pkg') in {folder for folder, _ in finder._memo}
+
+
+def test_ceiling(tmp_repo, monkeypatch):
+    """Ceiling argument and GIT_CEILING_DIRECTORIES stop the search."""
+    sub = tmp_repo / 'pkg' / 'sub'
+    sub.mkdir()
+    finder = RepoFinder()
+    with pytest.raises(InvalidGitRepositoryError):
+        finder.find(sub, ceiling=tmp_repo / 'pkg')
+    assert finder.find(sub) == tmp_repo / '.git'
+    monkeypatch.setenv('GIT_CEILING_DIRECTORIES', str(tmp_repo / 'pkg'))
+    with pytest.raises(InvalidGitRepositoryError):
+        finder.find(sub)
+
+
+def test_negative(tmp_path):
+    """Negative results are memoized for all visited folders."""
+    folder = tmp_path / 'a' / 'b'
+    folder.mkdir(parents=True)
+    finder = RepoFinder()
+    with pytest.raises(InvalidGitRepositoryError):
+        finder.find(folder, ceiling=tmp_path)
+    assert finder._memo[str(tmp_path / 'a'), frozenset([str(tmp_path)])] is None
+
+
+def test_site_packages():
+    """Search stops at site-packages."""
+    finder = RepoFinder()
+    purelib = Path(sysconfig.get_paths()['purelib']).resolve()
+    with pytest.raises(InvalidGitRepositoryError):
+        finder.find(Path(pytest.__file__).resolve())
+    assert str(purelib.parent) not in {folder for folder, _ in finder._memo}
@@ -0,0 +1,51 @@
+"""Tests for the on-disk status cache of gittools (pytest)."""
+
+
+import json
+
+import pytest
+
+import gittools
+from gittools import diskcache
+
+from conftest import git
+
+
+@pytest.fixture
+def cache_folder(tmp_path):
+    folder = tmp_path / 'cache'
+    gittools.enable_disk_cache(folder)
+    yield folder
+    diskcache._settings['folder'] = None
+
+
+def test_disabled(tmp_repo, monkeypatch):
+    """Disabled by default, can be enabled by environment variable."""
+    monkeypatch.delenv('GITTOOLS_DISK_CACHE', raising=False)
+    assert diskcache.cache_folder() is None
+    monkeypatch.setenv('GITTOOLS_DISK_CACHE', str(tmp_repo))
+    assert diskcache.cache_folder() == tmp_repo
+
+
+def test_disk_cache(tmp_repo, cache_folder):
+    """Status saved to disk, reused, and invalidated by new commits."""
+    pst = gittools.path_status(tmp_repo / 'a.txt')
+    file, = cache_folder.glob('*.json')
+    data = json.loads(file.read_text())
+    assert data['hash'] == pst['hash']
+    assert data['in_tree'] == {'a.txt': True}
+
+    # Data is taken from the cache if the fingerprint matches
+    data['describe'] = 'from cache'
+    file.write_text(json.dumps(data))
+    assert gittools.path_status(tmp_repo / 'a.txt')['describe'] == 'from cache'
+
+    # Dirty status is never cached
+    (tmp_repo / 'a.txt').write_text('modified\n')
+    assert gittools.path_status(tmp_repo / 'a.txt')['status'] == 'dirty'
+
+    git(tmp_repo, 'commit', '-q', '-am', 'second')
+    pst = gittools.path_status(tmp_repo / 'a.txt')
+    assert pst['hash'] == git(tmp_repo, 'rev-parse', 'HEAD')
+    assert 'describe' not in pst
+    assert json.loads(file.read_text())['hash'] == pst['hash']
@@ -0,0 +1,88 @@
+"""Tests for version lookup of installed packages in gittools (pytest)."""
+
+
+from types import ModuleType
+import json
+
+import importlib_metadata
+import pytest
+
+import gittools
+from gittools import distributions
+
+
+def make_dist(folder, name, version, top_level=None, record=None):
+    """Fake installed distribution (.dist-info folder) in folder."""
+    info = folder / f'{name}-{version}.dist-info'
+    info.mkdir(parents=True)
+    info.joinpath('METADATA').write_text(f'Name: {name}\nVersion: {version}\n')
+    if top_level is not None:
+        info.joinpath('top_level.txt').write_text(top_level + '\n')
+    if record is not None:
+        info.joinpath('RECORD').write_text(''.join(f'{f},,\n' for f in record))
+        for file in record:
+            (folder / file).parent.mkdir(parents=True, exist_ok=True)
+            (folder / file).write_text('')
+
+
+def test_version(tmp_path, monkeypatch):
+    """Import names differing from distribution names, sys.path changes."""
+    make_dist(tmp_path / 'a', 'PyFakeYAML', '5.4.1', top_level='fakeyaml')
+    make_dist(tmp_path / 'b', 'fake-record', '0.2',
+              record=['fakerec/__init__.py', 'single.py', 'data.txt'])
+
+    monkeypatch.syspath_prepend(str(tmp_path / 'a'))
+    assert distributions.version('fakeyaml') == '5.4.1'
+    assert distributions.version('fakeyaml.loader') == '5.4.1'
+    assert distributions.version('PyFakeYAML') == '5.4.1'
+    with pytest.raises(importlib_metadata.PackageNotFoundError):
+        distributions.version('fakerec')
+
+    monkeypatch.syspath_prepend(str(tmp_path / 'b'))  # index is rebuilt
+    assert distributions.version('fakerec') == '0.2'
+    assert distributions.version('single') == '0.2'
+    assert distributions.version('fake_record') == '0.2'
+    with pytest.raises(importlib_metadata.PackageNotFoundError):
+        distributions.version('data')
+
+
+def test_module_status_nogit(tmp_path, monkeypatch):
+    """module_status() of a module outside git uses distribution version."""
+    make_dist(tmp_path / 'site', 'PyFakeYAML', '5.4.1', top_level='fakeyaml')
+    monkeypatch.syspath_prepend(str(tmp_path / 'site'))
+    module = ModuleType('fakeyaml')
+    module.__file__ = str(tmp_path / 'site' / 'fakeyaml.py')
+    (tmp_path / 'site' / 'fakeyaml.py').write_text('')
+    mst = gittools.module_status(module, nogit_ok=True)
+    assert mst['fakeyaml'] == {'status': 'not a git repository',
+                               'tag': 'v5.4.1'}
+
+
+def test_direct_url(tmp_path, tmp_repo, monkeypatch):
+    """module_status() of packages installed from vcs / in editable mode."""
+    site = tmp_path / 'site'
+    commit = 'c0ffee' * 6 + 'c0fe'
+    make_dist(site, 'fromvcs', '1.0', top_level='fromvcs')
+    url = {'url': 'https://example.com/fromvcs.git',
+           'vcs_info': {'vcs': 'git', 'commit_id': commit}}
+    (site / 'fromvcs-1.0.dist-info' / 'direct_url.json').write_text(
+        json.dumps(url))
+    make_dist(site, 'editable', '0.1', top_level='editable')
+    url = {'url': tmp_repo.as_uri(), 'dir_info': {'editable': True}}
+    (site / 'editable-0.1.dist-info' / 'direct_url.json').write_text(
+        json.dumps(url))
+    monkeypatch.syspath_prepend(str(site))
+
+    modules = []
+    for name in 'fromvcs', 'editable':
+        module = ModuleType(name)
+        module.__file__ = str(site / f'{name}.py')
+        (site / f'{name}.py').write_text('')
+        modules.append(module)
+
+    mst = gittools.module_status(modules)
+    assert mst['fromvcs'] == {'hash': commit,
+                              'status': 'installed from vcs',
+                              'url': 'https://example.com/fromvcs.git',
+                              'tag': 'v1.0'}
+    assert mst['editable'] == gittools.path_status(tmp_repo)
@@ -3,6 +3,12 @@
 
 import gittools
 from pathlib import Path
+import json
+from types import ModuleType
+
+import pytest
+
+from conftest import git
 
 
 basepath = Path(gittools.__file__).parent / '..'
@@ -39,3 +45,180 @@ def test_tags():
     """Test repo_tags()"""
     tags = gittools.repo_tags()
     assert len(tags) > 0
+
+
+def test_repo_status(tmp_repo):
+    """Test RepoStatus (dirty flag, tree membership, tag at HEAD)"""
+    git(tmp_repo, 'tag', 'v1.0')
+    rs = gittools.RepoStatus(tmp_repo / 'a.txt')
+    assert rs.hash == git(tmp_repo, 'rev-parse', 'HEAD')
+    assert not rs.dirty and rs.in_tree and rs.tag == 'v1.0'
+    (tmp_repo / 'a.txt').write_text('modified\n')
+    (tmp_repo / 'untracked.txt').write_text('untracked\n')
+    rs = gittools.RepoStatus(tmp_repo / 'untracked.txt')
+    assert rs.dirty and not rs.in_tree
+    assert rs.to_dict() == {'hash': rs.hash, 'status': 'dirty', 'tag': 'v1.0',
+                            'describe': 'v1.0'}
+
+
+def test_scope(tmp_repo):
+    """Test scope='path' option of current_commit_hash() and path_status()"""
+    (tmp_repo / 'a.txt').write_text('modified\n')
+    with pytest.raises(gittools.DirtyRepo):
+        gittools.current_commit_hash(tmp_repo / 'pkg')
+    cch = gittools.current_commit_hash(tmp_repo / 'pkg', scope='path')
+    assert cch == git(tmp_repo, 'rev-parse', 'HEAD')
+    assert gittools.path_status(tmp_repo / 'pkg')['status'] == 'dirty'
+    pst = gittools.path_status(tmp_repo / 'pkg', scope='path')
+    assert pst['status'] == 'clean'
+
+
+def test_paths_status(tmp_repo, tmp_path):
+    """Test paths_status()"""
+    (tmp_repo / 'untracked.txt').write_text('untracked\n')
+    nogit = tmp_path / 'nogit.txt'
+    nogit.write_text('nogit\n')
+    paths = [tmp_repo / 'a.txt', str(tmp_repo / 'pkg'),
+             tmp_repo / 'untracked.txt', nogit]
+    pst = gittools.paths_status(paths, nogit_ok=True)
+    assert list(pst) == paths
+    sha = git(tmp_repo, 'rev-parse', 'HEAD')
+    assert pst[paths[0]] == {'hash': sha, 'status': 'clean', 'in_tree': True}
+    assert pst[paths[1]]['in_tree'] and not pst[paths[2]]['in_tree']
+    assert pst[nogit] == {'status': 'not a git repository'}
+
+
+def test_commit_tags(tmp_repo):
+    """Test commit_tags() and tags in path_status()"""
+    git(tmp_repo, 'tag', 'v2.1.0')
+    git(tmp_repo, 'tag', 'prod-2024-05')
+    assert gittools.commit_tags(tmp_repo) == ['prod-2024-05', 'v2.1.0']
+    pst = gittools.path_status(tmp_repo)
+    assert pst['tag'] == 'v2.1.0'
+    assert pst['tags'] == ['prod-2024-05', 'v2.1.0']
+
+
+def test_describe(tmp_repo):
+    """Test describe() and describe key of path_status()"""
+    assert gittools.describe(tmp_repo) is None
+    git(tmp_repo, 'tag', '-a', '-m', 'first', 'v1.4.2')
+    assert gittools.describe(tmp_repo) == 'v1.4.2'
+    for i in range(3):
+        (tmp_repo / 'a.txt').write_text(f'{i}\n')
+        git(tmp_repo, 'commit', '-q', '-am', f'commit {i}')
+    expected = git(tmp_repo, 'describe', '--tags')
+    assert expected.startswith('v1.4.2-3-g')
+    assert gittools.describe(tmp_repo) == expected
+    assert gittools.path_status(tmp_repo)['describe'] == expected
+
+
+def test_module_status_groups(tmp_repo, tmp_path, monkeypatch):
+    """Test module_status() on modules of several repos (one check per repo)"""
+    other = tmp_path / 'other'
+    (other / 'c').mkdir(parents=True)
+    (other / 'c' / '__init__.py').write_text('')
+    git(other, 'init', '-q')
+    git(other, 'add', '.')
+    git(other, 'commit', '-q', '-m', 'other')
+    (tmp_repo / 'a.txt').write_text('modified\n')
+
+    modules = []
+    for name, file in (('a', tmp_repo / 'a.txt'),
+                       ('c', other / 'c' / '__init__.py'),
+                       ('b', tmp_repo / 'pkg' / 'b.txt')):
+        module = ModuleType(name)
+        module.__file__ = str(file)
+        modules.append(module)
+
+    calls = []
+    is_dirty = gittools.index.is_dirty
+    monkeypatch.setattr(gittools.index, 'is_dirty',
+                        lambda repo, **kw: calls.append(repo) or
+                        is_dirty(repo, **kw))
+
+    for max_workers in None, 1:
+        calls.clear()
+        mst = gittools.module_status(modules, max_workers=max_workers)
+        assert list(mst) == ['a', 'c', 'b']
+        assert mst['a'] == mst['b']
+        assert mst['a']['status'] == 'dirty' and mst['c']['status'] == 'clean'
+        assert mst['c']['hash'] == git(other, 'rev-parse', 'HEAD')
+        assert len(calls) == 2
+
+    untracked = ModuleType('untracked')
+    untracked.__file__ = str(tmp_repo / 'untracked.py')
+    Path(untracked.__file__).write_text('')
+    with pytest.raises(gittools.NotInTree):
+        gittools.module_status([modules[1], untracked])
+    mst = gittools.module_status([modules[1], untracked], checktree=False)
+    assert mst['untracked']['in_tree'] is False
+    assert 'in_tree' not in mst['c']
+
+
+def test_environment_status(tmp_path):
+    """Test environment_status() and save_metadata(module='all')"""
+    est = gittools.environment_status()
+    assert list(est) == sorted(est)
+    assert est['gittools'] == gittools.path_status(gittools.__file__)
+    assert est['pytest']['tag'] == 'v' + pytest.__version__
+    assert not {'os', 'sys', 'json', 'builtins', 'gittools.gittools'} & set(est)
+
+    file = tmp_path / 'metadata.json'
+    gittools.save_metadata(file, module='all')
+    metadata = json.loads(file.read_text(encoding='utf8'))
+    assert metadata['code version'] == gittools.environment_status()
+
+
+def test_status_memo(tmp_repo, tmp_path, monkeypatch):
+    """save_metadata(status_ttl>0) reuses module_status() until repo changes"""
+    module = ModuleType('a')
+    module.__file__ = str(tmp_repo / 'a.txt')
+    file = tmp_path / 'metadata.json'
+
+    calls = []
+    is_dirty = gittools.index.is_dirty
+    monkeypatch.setattr(gittools.index, 'is_dirty',
+                        lambda repo, **kw: calls.append(repo) or
+                        is_dirty(repo, **kw))
+
+    for _ in range(3):
+        gittools.save_metadata(file, module=module, status_ttl=10)
+    assert len(calls) == 1
+
+    (tmp_repo / 'a.txt').write_text('modified\n')
+    git(tmp_repo, 'commit', '-q', '-am', 'modified')  # new HEAD
+    gittools.save_metadata(file, module=module, status_ttl=10)
+    assert len(calls) == 2
+    metadata = json.loads(file.read_text(encoding='utf8'))
+    assert metadata['code version']['a']['hash'] == git(tmp_repo, 'rev-parse',
+                                                        'HEAD')
+
+    gittools.save_metadata(file, module=module)  # no memoization by default
+    assert len(calls) == 3
+
+    (tmp_repo / 'a.txt').write_text('dirty\n')
+    git(tmp_repo, 'add', 'a.txt')  # index changes
+    with pytest.raises(gittools.DirtyRepo):
+        gittools.save_metadata(file, module=module, dirty_ok=False,
+                               status_ttl=10)
+    with pytest.raises(gittools.DirtyRepo):  # memoized, still raises
+        gittools.save_metadata(file, module=module, dirty_ok=False,
+                               status_ttl=10)
+    assert len(calls) == 4
+
+
+def test_status_memo_unstaged(tmp_repo, tmp_path):
+    """By default, save_metadata() sees unstaged edits made between calls"""
+    module = ModuleType('a')
+    module.__file__ = str(tmp_repo / 'a.txt')
+    file = tmp_path / 'metadata.json'
+
+    gittools.save_metadata(file, module=module)
+    (tmp_repo / 'a.txt').write_text('unstaged\n')  # index unchanged
+    assert gittools.path_status(module.__file__)['status'] == 'dirty'
+
+    with pytest.raises(gittools.DirtyRepo):
+        gittools.save_metadata(file, module=module, dirty_ok=False)
+    gittools.save_metadata(file, module=module)
+    metadata = json.loads(file.read_text(encoding='utf8'))
+    assert metadata['code version']['a']['status'] == 'dirty'
@@ -0,0 +1,48 @@
+"""Tests for lazy imports in gittools (pytest)."""
+
+
+import subprocess
+import sys
+
+import gittools
+
+
+def run(code, cwd):
+    """Run python code in a fresh interpreter and return its stdout."""
+    out = subprocess.run([sys.executable, '-c', code], cwd=cwd, check=True,
+                         stdout=subprocess.PIPE)
+    return out.stdout.decode().strip()
+
+
+def test_import_is_lazy(tmp_path):
+    """'import gittools' loads neither gitpython nor importlib_metadata."""
+    code = ('import sys, gittools; '
+            'print(sorted(m for m in sys.modules '
+            'if m.split(".")[0] in ("git", "importlib_metadata")))')
+    assert run(code, tmp_path) == '[]'
+
+
+def test_fast_path_is_lazy(tmp_repo):
+    """current_commit_hash() without checks does not need gitpython."""
+    code = ('import sys, gittools; '
+            'h = gittools.current_commit_hash(".", checkdirty=False, '
+            'checktree=False); '
+            'print(len(h), "git" in sys.modules)')
+    assert run(code, tmp_repo) == '40 False'
+
+
+def test_public_names():
+    """Lazily imported names are the same objects as in submodules."""
+    from gittools.gittools import module_status
+    from gittools.cache import clear_cache
+    assert gittools.module_status is module_status
+    assert gittools.clear_cache is clear_cache
+    assert set(gittools.__all__) <= set(dir(gittools))
+    assert isinstance(gittools.__version__, str)
+
+
+def test_submodules(tmp_path):
+    """Submodules are accessible as attributes without explicit import."""
+    code = ('import gittools; '
+            'print(gittools.gittools.__name__, hasattr(gittools, "nope"))')
+    assert run(code, tmp_path) == 'gittools.gittools False'
@@ -0,0 +1,102 @@
+"""Tests for native git index reading and dirty detection (pytest)."""
+
+
+import os
+import subprocess
+
+import pytest
+
+from gittools.index import read_index, is_dirty, worktree_changes
+from gittools.cache import get_repo
+
+from conftest import git
+
+
+def test_clean(tmp_repo):
+    """Freshly committed repo is clean, even after touching a file."""
+    assert not is_dirty(get_repo(tmp_repo))
+    os.utime(tmp_repo / 'a.txt', (1, 1))
+    assert not is_dirty(get_repo(tmp_repo))
+
+
+def test_modified(tmp_repo):
+    """Modified, deleted and staged files make the repo dirty."""
+    (tmp_repo / 'a.txt').write_text('b\n')  # same size
+    assert is_dirty(get_repo(tmp_repo))
+    assert worktree_changes(tmp_repo / '.git', tmp_repo) == [b'a.txt']
+    git(tmp_repo, 'add', 'a.txt')
+    assert is_dirty(get_repo(tmp_repo))
+    git(tmp_repo, 'commit', '-q', '-m', 'second')
+    assert not is_dirty(get_repo(tmp_repo))
+    (tmp_repo / 'pkg' / 'b.txt').unlink()
+    assert is_dirty(get_repo(tmp_repo))
+
+
+@pytest.mark.parametrize('objects', ['loose', 'packed'])
+def test_no_git_process(tmp_repo, monkeypatch, objects):
+    """HEAD objects read from loose objects or commit-graph, without git."""
+    if objects == 'packed':
+        git(tmp_repo, 'gc', '-q')
+        git(tmp_repo, 'commit-graph', 'write', '--reachable')
+    (tmp_repo / 'pkg' / 'c.txt').write_text('c\n')
+    git(tmp_repo, 'add', 'pkg/c.txt')  # staged, invalidates cache-tree of pkg
+    repo = get_repo(tmp_repo)
+    spawned = []
+    monkeypatch.setattr(subprocess.Popen, '_execute_child',
+                        lambda self, args, *a, **k: spawned.append(args))
+    assert is_dirty(repo)
+    assert not is_dirty(repo, path='a.txt')
+    if objects == 'loose':  # trees of subfolders are read from objects
+        assert is_dirty(repo, path='pkg')
+        assert not is_dirty(repo, path='pkg/b.txt')
+    assert spawned == []
+
+
+def test_untracked(tmp_repo):
+    """Untracked files are ignored, as in gitpython's is_dirty()."""
+    (tmp_repo / 'new.txt').write_text('new\n')
+    assert not is_dirty(get_repo(tmp_repo))
+
+
+@pytest.mark.parametrize('version', [2, 3, 4])
+def test_index_versions(tmp_repo, version):
+    """Index versions 2, 3, 4 (prefix compression) give the same entries."""
+    (tmp_repo / 'pkg' / 'c.txt').write_text('c\n')
+    git(tmp_repo, 'add', '.')
+    git(tmp_repo, 'update-index', '--index-version', str(version))
+    if version == 3:
+        git(tmp_repo, 'update-index', '--skip-worktree', 'a.txt')
+    entries, _ = read_index(tmp_repo / '.git')
+    paths = [e.path.decode() for e in entries]
+    assert paths == git(tmp_repo, 'ls-files').split('\n')
+    assert worktree_changes(tmp_repo / '.git', tmp_repo) == []
+
+
+def test_scope(tmp_repo):
+    """Dirtiness restricted to a subfolder or a file."""
+    repo = get_repo(tmp_repo)
+    (tmp_repo / 'a.txt').write_text('modified\n')
+    assert is_dirty(repo)
+    assert not is_dirty(repo, path='pkg')
+    assert not is_dirty(repo, path='pkg/b.txt')
+    (tmp_repo / 'pkg' / 'c.txt').write_text('c\n')
+    git(tmp_repo, 'add', 'pkg/c.txt')
+    assert is_dirty(repo, path='pkg')
+    assert not is_dirty(repo, path='pkg/b.txt')
+    git(tmp_repo, 'commit', '-q', '-m', 'second')
+    assert not is_dirty(repo, path='pkg')
+    (tmp_repo / 'pkg' / 'b.txt').write_text('modified\n')
+    assert is_dirty(repo, path='pkg/b.txt')
+
+
+@pytest.mark.parametrize('quick', [True, False])
+def test_git_fallback(tmp_repo, quick):
+    """git-based checks (used as fallback), with and without early exit."""
+    from gittools.index import _git_is_dirty
+    repo = get_repo(tmp_repo)
+    assert not _git_is_dirty(repo, quick=quick)
+    (tmp_repo / 'a.txt').write_text('modified\n')
+    assert _git_is_dirty(repo, quick=quick)
+    assert not _git_is_dirty(repo, path='pkg', quick=quick)
+    assert not _git_is_dirty(repo, working_tree=False, quick=quick)
+    assert is_dirty(repo, quick=quick)
@@ -0,0 +1,104 @@
+"""Tests for filesystem-based ref resolution in gittools (pytest)."""
+
+
+import os
+
+from gittools.refs import head_commit_hash, git_dir, common_dir
+from gittools.refs import tags, tags_fingerprint, TagIndex
+import gittools
+
+from conftest import git
+
+
+def test_loose_and_packed(tmp_repo):
+    """HEAD resolved through loose ref and through packed-refs."""
+    sha = git(tmp_repo, 'rev-parse', 'HEAD')
+    assert head_commit_hash(tmp_repo / '.git') == sha
+    git(tmp_repo, 'pack-refs', '--all')
+    assert head_commit_hash(tmp_repo / '.git') == sha
+
+
+def test_detached(tmp_repo):
+    """Detached HEAD."""
+    (tmp_repo / 'a.txt').write_text('aa\n')
+    git(tmp_repo, 'commit', '-q', '-am', 'second')
+    git(tmp_repo, 'checkout', '-q', 'HEAD~1')
+    sha = git(tmp_repo, 'rev-parse', 'HEAD')
+    assert head_commit_hash(tmp_repo / '.git') == sha
+    cch = gittools.current_commit_hash(tmp_repo, checkdirty=False,
+                                       checktree=False)
+    assert cch == sha
+
+
+def test_worktree(tmp_repo, tmp_path):
+    """Worktree with gitdir: file and commondir."""
+    wt = tmp_path / 'worktree'
+    git(tmp_repo, 'worktree', 'add', '-q', '-b', 'other', str(wt))
+    (wt / 'a.txt').write_text('other\n')
+    git(wt, 'commit', '-q', '-am', 'other')
+    gitdir = git_dir(wt / '.git')
+    assert common_dir(gitdir) == (tmp_repo / '.git').resolve()
+    assert head_commit_hash(wt / '.git') == git(wt, 'rev-parse', 'HEAD')
+    assert head_commit_hash(wt / '.git') != head_commit_hash(tmp_repo / '.git')
+
+
+def _git_tags(repo):
+    """{tag: commit} from git itself."""
+    names = git(repo, 'tag').split('\n')
+    return {name: git(repo, 'rev-parse', name + '^{commit}') for name in names}
+
+
+def test_tags(tmp_repo):
+    """Lightweight, annotated and nested tags; loose, packed and gc'ed."""
+    git(tmp_repo, 'tag', 'v1.0')
+    git(tmp_repo, 'tag', '-a', '-m', 'annotated', 'release/v1.0')
+    (tmp_repo / 'a.txt').write_text('aa\n')
+    git(tmp_repo, 'commit', '-q', '-am', 'second')
+    git(tmp_repo, 'tag', '-a', '-m', 'annotated', 'v2.0')
+    git(tmp_repo, 'tag', '-a', '-m', 'nested', 'nested', 'v2.0')
+    commondir = tmp_repo / '.git'
+    expected = _git_tags(tmp_repo)
+    assert tags(commondir) == expected
+    git(tmp_repo, 'pack-refs', '--all')
+    assert tags(commondir) == expected
+    git(tmp_repo, 'gc', '-q')
+    git(tmp_repo, 'tag', '-a', '-m', 'annotated', 'v2.1')
+    expected = _git_tags(tmp_repo)
+    assert tags(commondir) == expected
+    assert gittools.repo_tags(tmp_repo) == {c: t for t, c in expected.items()}
+
+
+def test_tag_index(tmp_repo):
+    """Several tags per commit, index invalidated when tags change."""
+    commondir = tmp_repo / '.git'
+    sha = git(tmp_repo, 'rev-parse', 'HEAD')
+    git(tmp_repo, 'tag', 'v2.1.0')
+    index = TagIndex(commondir)
+    assert index.tags_for(sha) == ('v2.1.0',)
+    assert index.is_valid(commondir)
+    git(tmp_repo, 'tag', '-a', '-m', 'prod', 'prod/2024-05')
+    assert not index.is_valid(commondir)
+    index = TagIndex(commondir)
+    assert index.tags_for(sha) == ('prod/2024-05', 'v2.1.0')
+    assert index.tags_for('0' * 40) == ()
+
+
+def test_tags_fingerprint(tmp_repo, monkeypatch):
+    """Tag folders are only listed again when one of them changes."""
+    commondir = tmp_repo / '.git'
+    git(tmp_repo, 'tag', 'prod/v1')
+    fingerprint = tags_fingerprint(commondir)
+
+    listed = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir',
+                        lambda path: listed.append(path) or scandir(path))
+    assert tags_fingerprint(commondir) == fingerprint
+    assert listed == []
+
+    for tag in 'prod/v2', 'dev/new/v1':
+        git(tmp_repo, 'tag', tag)
+        new_fingerprint = tags_fingerprint(commondir)
+        assert new_fingerprint != fingerprint and listed
+        fingerprint = new_fingerprint
+        listed.clear()
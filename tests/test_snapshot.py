@@ -0,0 +1,94 @@
+"""Tests for parent-to-child status handoff in gittools (pytest)."""
+
+
+from pathlib import Path
+from types import ModuleType
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+from git import InvalidGitRepositoryError
+import pytest
+
+import gittools
+from gittools import snapshot
+
+from conftest import git
+
+
+@pytest.fixture
+def module(tmp_repo, monkeypatch):
+    """Python package 'pkg' in tmp_repo, imported."""
+    (tmp_repo / 'pkg' / '__init__.py').write_text('"""Test package"""\n')
+    git(tmp_repo, 'add', '.')
+    git(tmp_repo, 'commit', '-q', '-m', 'package')
+    monkeypatch.syspath_prepend(str(tmp_repo))
+    monkeypatch.delenv(snapshot.ENV_VAR, raising=False)
+    sys.modules.pop('pkg', None)
+    yield importlib.import_module('pkg')
+    sys.modules.pop('pkg', None)
+
+
+def test_export(module, tmp_repo, monkeypatch):
+    """Exported status reused while the repo is unchanged."""
+    value = gittools.export_status(module)
+    assert os.environ[snapshot.ENV_VAR] == value
+    entry = json.loads(value)['pkg']
+    assert entry['info'] == gittools.path_status(module.__file__)
+
+    entry['info']['tag'] = 'from snapshot'
+    monkeypatch.setenv(snapshot.ENV_VAR, json.dumps({'pkg': entry}))
+    assert gittools.module_status(module)['pkg']['tag'] == 'from snapshot'
+    assert 'tag' not in gittools.module_status(module, scope='path')['pkg']
+
+    git(tmp_repo, 'commit', '-q', '--allow-empty', '-m', 'new commit')
+    assert 'tag' not in gittools.module_status(module)['pkg']
+
+
+def test_file_and_child_process(module, tmp_repo, tmp_path):
+    """Snapshot in file, read by a child process."""
+    file = tmp_path / 'status.json'
+    value = gittools.export_status(module, file=file)
+    assert value == '@' + str(file.resolve())
+    entries = json.loads(file.read_text())
+    entries['pkg']['info']['tag'] = 'from snapshot'
+    file.write_text(json.dumps(entries))
+    code = ('import json, gittools, pkg; '
+            'print(json.dumps(gittools.module_status(pkg)))')
+    env = {**os.environ, 'PYTHONPATH': str(tmp_repo)}
+    out = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                         stdout=subprocess.PIPE).stdout
+    assert json.loads(out)['pkg'] == entries['pkg']['info']
+
+
+def test_options_and_parent(module, tmp_repo, tmp_path, monkeypatch):
+    """Snapshot used only with same options, and not by the exporter."""
+    other = tmp_path / 'other' / 'nogit.py'
+    other.parent.mkdir()
+    other.write_text('')
+    nogit = ModuleType('nogit')
+    nogit.__file__ = str(other)
+
+    value = gittools.export_status([module, nogit], nogit_ok=True)
+    (tmp_repo / 'a.txt').write_text('modified\n')  # unstaged change
+    assert gittools.module_status(module)['pkg']['status'] == 'dirty'
+
+    monkeypatch.setenv(snapshot.ENV_VAR, json.dumps(json.loads(value)))
+    mst = gittools.module_status([module, nogit], nogit_ok=True)
+    assert mst['pkg']['status'] == 'clean'  # from snapshot
+    assert mst['nogit']['status'] == 'not a git repository'
+    with pytest.raises(InvalidGitRepositoryError):
+        gittools.module_status(nogit)
+    assert gittools.module_status(module)['pkg']['status'] == 'dirty'
+
+
+def test_temporary_file(module, tmp_repo):
+    """Temporary file of large snapshot removed when the exporter exits."""
+    code = ('import gittools, pkg; gittools.snapshot.MAX_ENV_SIZE = 0; '
+            'print(gittools.export_status(pkg))')
+    env = {**os.environ, 'PYTHONPATH': str(tmp_repo)}
+    out = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                         stdout=subprocess.PIPE).stdout.decode().strip()
+    assert out.startswith('@') and not Path(out[1:]).exists()
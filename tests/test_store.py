@@ -0,0 +1,74 @@
+"""Tests for the SQLite provenance store of gittools (pytest)."""
+
+
+import subprocess
+import sys
+
+import gittools
+from gittools.store import ProvenanceStore, main
+
+
+def test_save_and_find(tmp_path):
+    """save_metadata() into a store, and queries on code versions / time."""
+    db = tmp_path / 'provenance.sqlite'
+    for i in range(3):
+        gittools.save_metadata(db, info={'run': i, 'path': tmp_path},
+                               module=gittools)
+
+    status = gittools.module_status(gittools)['gittools']
+
+    with ProvenanceStore(db) as store:
+        assert len(store) == 3
+        records = store.find(module='gittools', hash=status['hash'][:7])
+        assert [record['run'] for record in records] == [0, 1, 2]
+        assert records[0]['path'] == str(tmp_path)
+        assert records[0]['code version'] == {'gittools': status}
+        assert len(store.find(module='gittools', hash=status['hash'])) == 3
+        assert len(store.find(status=status['status'])) == 3
+        assert store.find(module='other') == []
+        assert store.find(hash='0000000') == []
+        time = records[0]['time (utc)']
+        assert len(store.find(start=time)) == 3
+        assert store.find(end=time) == []
+
+
+def test_writer_to_store(tmp_path):
+    """MetadataWriter can write to a store shared with the caller."""
+    with ProvenanceStore(tmp_path / 'provenance.db') as store:
+        with gittools.MetadataWriter() as writer:
+            for i in range(10):
+                writer.save(store, info={'frame': i})
+        assert [r['frame'] for r in store.find()] == list(range(10))
+
+
+def test_concurrent_writers(tmp_path):
+    """Many processes write to the same store (WAL mode)."""
+    db = tmp_path / 'provenance.sqlite'
+    code = ('import sys, gittools; '
+            '[gittools.save_metadata(sys.argv[1], info={"n": n}) '
+            'for n in range(25)]')
+    procs = [subprocess.Popen([sys.executable, '-c', code, str(db)])
+             for _ in range(4)]
+    assert all(proc.wait() == 0 for proc in procs)
+    with ProvenanceStore(db) as store:
+        assert len(store) == 100
+
+
+def test_ingest(tmp_path, capsys):
+    """Migration of existing JSON / JSON Lines files."""
+    gittools.save_metadata(tmp_path / 'a.json', info={'n': 0},
+                           module=gittools)
+    for n in 1, 2, 3:
+        gittools.save_metadata(tmp_path / 'b.jsonl', info={'n': n},
+                               mode='append')
+    (tmp_path / 'broken.json').write_text('{"n": ')
+
+    db = tmp_path / 'provenance.sqlite'
+    main([str(db)] + [str(tmp_path / name)
+                      for name in ('a.json', 'b.jsonl', 'broken.json')])
+    out = capsys.readouterr().out
+    assert '4 records added' in out and 'broken.json' in out
+
+    with ProvenanceStore(db) as store:
+        assert sorted(record['n'] for record in store.find()) == [0, 1, 2, 3]
+        assert [record['n'] for record in store.find(module='gittools')] == [0]
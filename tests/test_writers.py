@@ -0,0 +1,161 @@
+"""Tests for writing of metadata files in gittools (pytest)."""
+
+
+from pathlib import Path
+from types import ModuleType
+import datetime
+import json
+import subprocess
+import sys
+
+import pytest
+
+import gittools
+from gittools import writers
+
+from conftest import git
+
+
+def test_append(tmp_path):
+    """save_metadata(mode='append') writes one JSON record per line."""
+    file = tmp_path / 'log.jsonl'
+    for i in range(3):
+        gittools.save_metadata(file, info={'i': i, 'T (°C)': 20.5},
+                               module=gittools, mode='append')
+    lines = file.read_text(encoding='utf8').splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record['i'] for record in records] == [0, 1, 2]
+    assert records[0]['T (°C)'] == 20.5
+    assert 'gittools' in records[0]['code version']
+    with pytest.raises(ValueError):
+        gittools.save_metadata(file, mode='overwrite')
+
+
+def test_concurrent_append(tmp_path):
+    """Lines written by many processes at once are neither lost nor mixed."""
+    file = tmp_path / 'log.jsonl'
+    code = ('import sys; from gittools import writers; '
+            '[writers.append_jsonl(sys.argv[1], '
+            '{"proc": int(sys.argv[2]), "n": n, "data": "x" * 20000}) '
+            'for n in range(50)]')
+    procs = [subprocess.Popen([sys.executable, '-c', code, str(file), str(i)])
+             for i in range(4)]
+    assert all(proc.wait() == 0 for proc in procs)
+    records = [json.loads(line) for line in file.read_text().splitlines()]
+    assert len(records) == 200
+    for i in range(4):
+        assert [r['n'] for r in records if r['proc'] == i] == list(range(50))
+
+
+def test_background_writer(tmp_path, monkeypatch):
+    """MetadataWriter saves records in order, off the caller's thread."""
+    file = tmp_path / 'log.jsonl'
+    info = {'frame': 0}
+
+    with gittools.MetadataWriter(maxsize=2) as writer:
+        for i in range(10):
+            info['frame'] = i
+            writer.save(file, info=info, module=gittools, mode='append')
+        writer.flush()
+        records = [json.loads(line) for line in file.read_text().splitlines()]
+        assert [record['frame'] for record in records] == list(range(10))
+        assert 'gittools' in records[0]['code version']
+
+        writer.save(tmp_path / 'missing' / 'log.json', info=info)
+        with pytest.raises(FileNotFoundError):
+            writer.flush()
+
+    with pytest.raises(RuntimeError):
+        writer.save(file, info=info)
+
+
+def test_background_writer_same_repo(tmp_repo, tmp_path):
+    """Caller's thread can query the repo the writer is working on."""
+    git(tmp_repo, 'tag', '-a', '-m', 'first', 'v1.0')
+    git(tmp_repo, 'gc', '-q')  # packed objects, read with git cat-file
+    module = ModuleType('a')
+    module.__file__ = str(tmp_repo / 'a.txt')
+    file = tmp_path / 'log.jsonl'
+    expected = gittools.path_status(module.__file__)
+
+    with gittools.MetadataWriter() as writer:
+        for i in range(50):
+            writer.save(file, info={'n': i}, module=module, mode='append',
+                        status_ttl=0)
+            assert gittools.path_status(module.__file__) == expected
+        writer.flush()
+
+    records = [json.loads(line) for line in file.read_text().splitlines()]
+    assert [record['code version']['a'] for record in records] == \
+        [expected] * 50
+
+
+def test_background_writer_atexit(tmp_path):
+    """Pending records are written when the interpreter exits."""
+    file = tmp_path / 'log.jsonl'
+    code = ('import sys, gittools; w = gittools.MetadataWriter(); '
+            '[w.save(sys.argv[1], info={"n": n}, module="all", '
+            'mode="append") for n in range(20)]')
+    subprocess.run([sys.executable, '-c', code, str(file)], check=True)
+    assert len(file.read_text().splitlines()) == 20
+
+
+class Array:
+    """Minimal stand-in for a NumPy array (tolist() method)."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def tolist(self):
+        return list(self.values)
+
+
+INFO = {'path': Path('data') / 'img.tif',
+        'date': datetime.datetime(2024, 5, 1, 12, 30),
+        'roi': Array([1, 2, 3]),
+        'T (°C)': 20.5}
+
+EXPECTED = {'path': str(Path('data') / 'img.tif'),
+            'date': '2024-05-01T12:30:00',
+            'roi': [1, 2, 3],
+            'T (°C)': 20.5}
+
+
+@pytest.mark.parametrize('serializer', ['json', 'compact-json', 'fast'])
+@pytest.mark.parametrize('mode', ['write', 'append'])
+def test_json_serializers(tmp_path, serializer, mode):
+    """Non-JSON types in info are converted, in all JSON formats."""
+    file = tmp_path / 'metadata.json'
+    gittools.save_metadata(file, info=INFO, mode=mode, serializer=serializer)
+    text = file.read_text(encoding='utf8')
+    metadata = json.loads(text)
+    del metadata['time (utc)']
+    assert metadata == EXPECTED
+    assert (text.count('\n') > 1) == (serializer == 'json' and mode == 'write')
+
+
+def test_orjson():
+    """orjson output is the same as compact JSON."""
+    pytest.importorskip('orjson')
+    orjson = writers.get_serializer('orjson')
+    assert json.loads(orjson.dumps(INFO)) == EXPECTED
+    assert orjson.dumps_record(INFO).endswith(b'}\n')
+
+
+def test_msgpack(tmp_path):
+    """MessagePack records appended to a file can be read back."""
+    msgpack = pytest.importorskip('msgpack')
+    file = tmp_path / 'metadata.msgpack'
+    for i in range(3):
+        gittools.save_metadata(file, info={**INFO, 'i': i}, mode='append',
+                               serializer='msgpack')
+    with open(file, 'rb') as f:
+        records = list(msgpack.Unpacker(f))
+    assert [record['i'] for record in records] == [0, 1, 2]
+    assert records[0]['roi'] == [1, 2, 3]
+
+
+def test_unknown_serializer(tmp_path):
+    with pytest.raises(ValueError):
+        gittools.save_metadata(tmp_path / 'a.json', serializer='yaml')
+    assert not (tmp_path / 'a.json').exists()